@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""
+Micro-benchmark of GP WebPay signing and verification: keys loaded for every call vs. keys.KeyStore.
+
+Uses a generated RSA key pair, no database nor bank account is needed:
+
+    python benchmarks/gp_keys.py [iterations]
+"""
+import base64
+import os
+import sys
+import tempfile
+import timeit
+
+from django.conf import settings
+
+# the repository root, when the package is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+settings.configure()
+
+from Crypto.Hash import SHA1  # noqa: E402
+from Crypto.PublicKey import RSA  # noqa: E402
+from Crypto.Signature import PKCS1_v1_5  # noqa: E402
+from OpenSSL import crypto  # noqa: E402
+
+from commerce.gateways.globalpayments.keys import KeyStore  # noqa: E402
+
+PASSWORD = b'benchmark'
+DATA = '123456789|CREATE_ORDER|1001|12900|978|1|1001|https://example.com/result/|Order 1001|'
+
+
+def create_keys(directory):
+    key = crypto.PKey()
+    key.generate_key(crypto.TYPE_RSA, 2048)
+    private_key_path = os.path.join(directory, 'private.pem')
+    public_key_path = os.path.join(directory, 'public.pem')
+
+    with open(private_key_path, 'wb') as private_key_file:
+        private_key_file.write(crypto.dump_privatekey(crypto.FILETYPE_PEM, key, 'aes256', PASSWORD))
+
+    with open(public_key_path, 'wb') as public_key_file:
+        public_key_file.write(crypto.dump_publickey(crypto.FILETYPE_PEM, key))
+
+    return private_key_path, public_key_path
+
+
+def load_private_key(key):
+    return crypto.load_privatekey(crypto.FILETYPE_PEM, key, PASSWORD)
+
+
+def load_verifier(key):
+    return PKCS1_v1_5.new(RSA.importKey(key))
+
+
+def read(path):
+    with open(path, 'r') as key_file:
+        return key_file.read()
+
+
+def sign(pkey):
+    return base64.b64encode(crypto.sign(pkey, DATA, 'sha1')).decode('utf-8')
+
+
+def verify(verifier, signature):
+    digest = SHA1.new()
+    digest.update(DATA.encode('utf-8'))
+    return verifier.verify(digest, base64.b64decode(signature))
+
+
+def main(iterations):
+    with tempfile.TemporaryDirectory() as directory:
+        private_key_path, public_key_path = create_keys(directory)
+        key_store = KeyStore()
+        signature = sign(load_private_key(read(private_key_path)))
+
+        cases = {
+            'sign, key loaded every call': lambda: sign(load_private_key(read(private_key_path))),
+            'sign, KeyStore': lambda: sign(key_store.get('private', private_key_path, load_private_key, PASSWORD)),
+            'verify, key loaded every call': lambda: verify(load_verifier(read(public_key_path)), signature),
+            'verify, KeyStore': lambda: verify(key_store.get('public', public_key_path, load_verifier), signature),
+        }
+
+        for name, case in cases.items():
+            seconds = timeit.timeit(case, number=iterations)
+            print(f'{name:32} {seconds / iterations * 1000:8.3f} ms per call')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
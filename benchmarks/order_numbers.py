@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Concurrent checkout benchmark of order number allocation: locked order table (previous implementation),
+CounterOrderNumberAllocator and SequenceOrderNumberAllocator with different block sizes.
+
+Every simulated checkout allocates a number inside a transaction which stays open for --hold milliseconds
+(order and its items insert). Needs PostgreSQL database of a project with commerce installed and migrated;
+run it against a test or staging database, not production:
+
+    DJANGO_SETTINGS_MODULE=project.settings python benchmarks/order_numbers.py --threads 16 --checkouts 50
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+
+import django
+
+# the repository root, when the package is not installed
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+django.setup()
+
+from django.db import connection, connections, transaction  # noqa: E402
+from django.db.models import Max  # noqa: E402
+
+from commerce.models import NumberCounter, Order  # noqa: E402
+from commerce.numbering import CounterOrderNumberAllocator, SequenceOrderNumberAllocator  # noqa: E402
+
+BENCHMARK_NAME = 'commerce_benchmark'
+
+
+class LockTableAllocator(object):
+    # previous Order.get_next_number()
+    def get_next_number(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {Order._meta.db_table}')
+
+        last_number = Order.objects.aggregate(max=Max('number'))['max']
+        return (last_number or 0) + 1
+
+
+class BenchmarkCounterAllocator(CounterOrderNumberAllocator):
+    counter_name = BENCHMARK_NAME
+
+
+class BenchmarkSequenceAllocator(SequenceOrderNumberAllocator):
+    sequence_name = BENCHMARK_NAME
+
+    def __init__(self, block_size=None):
+        super().__init__(block_size)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {self.sequence_name}')
+            cursor.execute(f'CREATE SEQUENCE {self.sequence_name} START WITH {int(self.get_first_number())} INCREMENT BY {int(self.block_size)}')
+
+
+def checkout(allocator, checkouts, hold, numbers, errors):
+    try:
+        for i in range(checkouts):
+            with transaction.atomic():
+                numbers.append(allocator.get_next_number())
+                time.sleep(hold)
+    except Exception as e:
+        errors.append(e)
+    finally:
+        connections.close_all()
+
+
+def run(name, allocator, threads, checkouts, hold):
+    numbers = []
+    errors = []
+    workers = [threading.Thread(target=checkout, args=(allocator, checkouts, hold, numbers, errors)) for i in range(threads)]
+    start = time.perf_counter()
+
+    for worker in workers:
+        worker.start()
+
+    for worker in workers:
+        worker.join()
+
+    duration = time.perf_counter() - start
+    # numbers of the lock table allocator repeat: benchmark does not insert orders
+    duplicates = len(numbers) - len(set(numbers))
+    print(f'{name:28} {len(numbers) / duration:10.1f} checkouts/s  {duration:7.2f} s  duplicates: {duplicates}  errors: {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--checkouts', type=int, default=50, help='checkouts per thread')
+    parser.add_argument('--hold', type=float, default=5, help='milliseconds the checkout transaction stays open')
+    args = parser.parse_args()
+    hold = args.hold / 1000
+
+    try:
+        run('lock table (previous)', LockTableAllocator(), args.threads, args.checkouts, hold)
+        run('counter row', BenchmarkCounterAllocator(), args.threads, args.checkouts, hold)
+
+        for block_size in [1, 10, 100]:
+            run(f'sequence, block size {block_size}', BenchmarkSequenceAllocator(block_size), args.threads, args.checkouts, hold)
+    finally:
+        NumberCounter.objects.filter(name=BENCHMARK_NAME).delete()
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP SEQUENCE IF EXISTS {BENCHMARK_NAME}')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,16 @@
-from decimal import Decimal
-
-import requests
 from django.contrib import admin, messages
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.admin import GenericTabularInline
 from django.contrib.contenttypes.models import ContentType
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import EMPTY_VALUES
-from django.shortcuts import render
 from django.utils.safestring import mark_safe
 from internationalflavor.countries._cldr_data import COUNTRY_NAMES
 from modeltrans.admin import ActiveLanguageMixin
 
+from commerce.jobs import sync_bank_transactions
 from commerce.loyalty import send_loyalty_reminder
-from commerce.models import Cart, Item, ShippingOption, PaymentMethod, Order, PurchasedItem, Option, Discount, Supply
+from commerce.models import Cart, Item, ShippingOption, PaymentMethod, Order, PurchasedItem, Option, Discount, Supply, StockLevel, \
+    LoyaltyTransaction, BankTransaction
 from commerce import settings as commerce_settings
 
 from django.utils.translation import gettext_lazy as _
@@ -38,7 +35,7 @@ class SupplyInline(GenericTabularInline):
 
 @admin.register(Cart)
 class CartAdmin(admin.ModelAdmin):
-    list_display = ('id', 'user', 'items', 'discount', 'total', 'delivery_country', 'created', 'modified', 'open')
+    list_display = ('id', 'user', 'items', 'discount', 'total', 'delivery_country', 'created', 'modified', 'last_activity', 'open')
     list_select_related = ['user', 'discount']
     inlines = [ItemInline]
     fieldsets = [
@@ -49,9 +46,9 @@ class CartAdmin(admin.ModelAdmin):
         (_('Contact details'), {'fields': [('email', 'phone')]}),
         (_('Shipping'), {'fields': ['shipping_option', 'payment_method']}),
         (_('Others'), {'fields': ['discount', ]}),
-        (_('Timestamps'), {'fields': ['created', 'modified']}),
+        (_('Timestamps'), {'fields': ['created', 'modified', 'last_activity', 'abandoned_reminder_sent']}),
     ]
-    readonly_fields = ['created', 'modified']
+    readonly_fields = ['created', 'modified', 'last_activity', 'abandoned_reminder_sent']
 
     def items(self, obj):
         return ', '.join([str(item) for item in obj.item_set.all()])
@@ -103,15 +100,22 @@ class OrderAdmin(admin.ModelAdmin):
         (_('Contact details'), {'fields': [('email', 'phone')]}),
         (_('Shipping'), {'fields': ['shipping_option', 'shipping_fee', 'payment_method', 'payment_fee']}),
         (_('Billing'), {'fields': ['invoices', 'discount']}),
+        (_('Totals'), {'fields': [('items_subtotal', 'credit', 'tax', 'total')]}),
         (_('Timestamps'), {'fields': ['reminder_sent', 'created', 'modified']}),
     ]
     autocomplete_fields = ['invoices']
-    readonly_fields = ['created', 'modified']
+    readonly_fields = ['items_subtotal', 'credit', 'tax', 'total', 'created', 'modified']
     ordering = ['-number']
 
     def get_queryset(self, request):
         return super().get_queryset(request).prefetch_related('purchaseditem_set', 'invoices')
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+
+        # purchased items, fees or discount could change
+        form.instance.update_totals()
+
     def delivery_address(self, obj):
         return mark_safe('<br>'.join([str(item) for item in [
             obj.delivery_name,
@@ -139,85 +143,17 @@ class OrderAdmin(admin.ModelAdmin):
             messages.error(request, _('Missing bank API'))
             return
 
-        transactions = []
-
-        if commerce_settings.BANK_API == 'FIO':
-            date_from = '1993-01-01'
-            date_to = '2993-12-31'  # TODO
-            url = f'https://www.fio.cz/ib_api/rest/periods/{commerce_settings.BANK_API_TOKEN}/{date_from}/{date_to}/transactions.json'
-            r = requests.get(url)
-            data = r.json()
-            transaction_list = data['accountStatement']['transactionList']['transaction']
-
-            mapping = {
-                'date': 'column0',  # Datum
-                'value': 'column1',  # Objem
-                'sender': 'column10',  # Název protiúčtu
-                'sender_bank': 'column12',  # Název banky
-                'sender_account': 'column2',  # Protiúčet
-                'currency': 'column14',  # Měna
-                'information': 'column16',  # Zpráva pro příjemce
-                'variable_symbol': 'column5',  # VS
-                'type': 'column8',  # Typ
-                'issued_by': 'column9',  # Provedl
-            }
-
-            for t in transaction_list:
-                transaction = {}
-
-                for key, column in mapping.items():
-                    value = t[column]['value'] if t[column] is not None else None
-                    transaction[key] = Decimal(str(value)) if key == 'value' else value
-
-                transactions.append(transaction)
-
-        else:
-            messages.error(request, _(f'Bank API {commerce_settings.BANK_API} not implemented'))
+        if commerce_settings.BANK_API not in commerce_settings.BANK_ADAPTERS:
+            messages.error(request, _('Bank API %s not implemented') % commerce_settings.BANK_API)
             return
 
-        numbers_of_selected_orders = list(queryset.values_list('number', flat=True))
-
-        transactions = list(filter(lambda tr: str(tr['variable_symbol']) in list(map(str, numbers_of_selected_orders)), transactions))
-
-        for transaction in transactions:
-            transaction['errors'] = []
-
-            variable_symbol = transaction['variable_symbol']
-
-            if variable_symbol and variable_symbol.isdigit():
-                variable_symbol = int(variable_symbol)
-
-                try:
-                    order = Order.objects.get(number=variable_symbol)
-                except ObjectDoesNotExist:
-                    transaction['errors'].append(_('Order not found'))
-                    continue
-
-                transaction['order'] = order
-                transaction['order_status_before'] = order.status
-                transaction['order_status_before_display'] = order.get_status_display()
-                transaction['order_status_after'] = order.status
-                transaction['order_status_after_display'] = order.get_status_display()
-
-                if order in queryset and order.status == Order.STATUS_AWAITING_PAYMENT:
-                    if transaction['currency'] != commerce_settings.CURRENCY:
-                        transaction['errors'].append(_('Currency mismatch'))
-                    elif transaction['value'] != order.total:
-                        transaction['errors'].append(_('Total value mismatch'))
-                    else:
-                        order.status = Order.STATUS_PAYMENT_RECEIVED
-                        order.save(update_fields=['status'])
-                        transaction['order_status_after'] = order.status
-                        transaction['order_status_after_display'] = order.get_status_display()
-            else:
-                transaction['errors'].append(_('Missing variable symbol'))
-
-        return render(request, 'commerce/admin/sync_transactions.html', context={'transactions': transactions})
+        # all orders awaiting payment are matched in background
+        sync_bank_transactions.delay()
+        messages.info(request, _('Synchronization of bank transactions started, see bank transactions for results'))
     sync_transactions.short_description = _('Sync transactions')
 
     def create_invoice(self, request, queryset):
-        for obj in queryset:
-            obj.create_invoice(creator=request.user)
+        Order.create_invoices(queryset, creator=request.user)
     create_invoice.short_description = _('Create invoice')
 
     def send_details(self, request, queryset):
@@ -301,6 +237,14 @@ class SupplyAdmin(admin.ModelAdmin):
     autocomplete_fields = ['content_type']
 
 
+@admin.register(StockLevel)
+class StockLevelAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'option', 'supplies', 'purchased', 'in_stock', 'modified')
+    list_select_related = ['content_type', 'option']
+    list_filter = ['content_type', 'option']
+    readonly_fields = ['content_type', 'object_id', 'option', 'supplies', 'purchased', 'modified']
+
+
 @admin.register(PurchasedItem)
 class PurchasedItemAdmin(admin.ModelAdmin):
     date_hierarchy = 'created'
@@ -316,3 +260,40 @@ class PurchasedItemAdmin(admin.ModelAdmin):
     
     def order_status(self, obj):
         return obj.order.get_status_display()
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        obj.order.update_totals()
+
+    def delete_model(self, request, obj):
+        super().delete_model(request, obj)
+        obj.order.update_totals()
+
+    def delete_queryset(self, request, queryset):
+        orders = list(Order.objects.filter(purchaseditem__in=queryset).distinct())
+        super().delete_queryset(request, queryset)
+
+        for order in orders:
+            order.update_totals()
+
+
+@admin.register(BankTransaction)
+class BankTransactionAdmin(admin.ModelAdmin):
+    date_hierarchy = 'date'
+    search_fields = ['transaction_id', 'variable_symbol', 'sender', 'sender_account', 'information', 'order__number']
+    list_display = ('transaction_id', 'bank', 'date', 'value', 'currency', 'variable_symbol', 'sender', 'order', 'result', 'errors', 'created')
+    list_select_related = ['order']
+    list_filter = ['bank', 'result', 'currency']
+    autocomplete_fields = ['order']
+    readonly_fields = ['bank', 'transaction_id', 'date', 'value', 'currency', 'variable_symbol', 'sender', 'sender_account', 'sender_bank', 'information', 'type', 'issued_by', 'result', 'errors', 'created']
+
+
+@admin.register(LoyaltyTransaction)
+class LoyaltyTransactionAdmin(admin.ModelAdmin):
+    date_hierarchy = 'created'
+    search_fields = ['user__email', 'user__first_name', 'user__last_name', 'order__number']
+    list_display = ('id', 'user', 'order', 'type', 'points', 'created')
+    list_select_related = ['user', 'order']
+    list_filter = ['type']
+    autocomplete_fields = ['user', 'order']
+    readonly_fields = ['created']
@@ -2,7 +2,9 @@ import django_rq
 from django.apps import AppConfig
 from django.conf import settings
 
-from commerce.cron import send_order_reminders, cancel_unpaid_orders, delete_old_empty_carts, send_loyalty_reminders
+from commerce import settings as commerce_settings
+from commerce.cron import send_order_reminders, cancel_unpaid_orders, delete_old_empty_carts, send_loyalty_reminders, \
+    delete_abandoned_carts, send_abandoned_cart_reminders, sync_bank_transactions
 
 from django.utils.translation import gettext_lazy as _
 
@@ -21,6 +23,14 @@ class Config(AppConfig):
             timeout=settings.RQ_QUEUES['cron']['DEFAULT_TIMEOUT']
         )
 
+        # Cron task to sync bank transactions
+        if commerce_settings.BANK_API:
+            scheduler.cron(
+                "*/30 * * * *",  # Run every 30 minutes
+                func=sync_bank_transactions,
+                timeout=settings.RQ_QUEUES['cron']['DEFAULT_TIMEOUT']
+            )
+
         # Cron task to send order reminders
         scheduler.cron(
             "0 10 * * *",  # Run every day at 10:00 [UTC]
@@ -42,5 +52,16 @@ class Config(AppConfig):
             timeout=settings.RQ_QUEUES['cron']['DEFAULT_TIMEOUT']
         )
 
-        # TODO: delete old abandoned carts (not empty, but youngest item is old already)
-        # TODO: notify not empty abandoned carts
+        # Cron task to delete old abandoned carts (not empty, but without activity)
+        scheduler.cron(
+            "30 1 * * *",  # Run every day at 01:30 [UTC]
+            func=delete_abandoned_carts,
+            timeout=settings.RQ_QUEUES['cron']['DEFAULT_TIMEOUT']
+        )
+
+        # Cron task to notify not empty abandoned carts
+        scheduler.cron(
+            "0 17 * * *",  # Run every day at 17:00 [UTC]
+            func=send_abandoned_cart_reminders,
+            timeout=settings.RQ_QUEUES['cron']['DEFAULT_TIMEOUT']
+        )
@@ -0,0 +1,250 @@
+import csv
+import time
+from decimal import Decimal
+
+import requests
+from django.core.validators import EMPTY_VALUES
+from django.db import transaction
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from commerce import settings as commerce_settings
+
+try:
+    # streaming JSON parser (optional)
+    import ijson
+except ImportError:
+    ijson = None
+
+
+class BankAdapter(object):
+    """
+    Downloads new transactions of bank account.
+
+    Transactions are dictionaries with keys: id, date, value, currency, variable_symbol, sender, sender_account,
+    sender_bank, information, type, issued_by.
+    """
+    name = None
+
+    def __init__(self, token):
+        self.token = token
+
+    def get_transactions(self, cursor=None):
+        """
+        Returns iterable of transactions newer than cursor (ID of the last stored transaction)
+        """
+        raise NotImplementedError()
+
+    def reset_cursor(self, cursor):
+        """
+        Aligns server side mark of downloaded transactions with cursor (no-op if bank does not keep any)
+        """
+        pass
+
+
+class FioBankAdapter(BankAdapter):
+    name = 'FIO'
+    api_url = 'https://www.fio.cz/ib_api/rest'
+    mapping = {
+        'id': 'column22',  # ID pohybu
+        'date': 'column0',  # Datum
+        'value': 'column1',  # Objem
+        'sender': 'column10',  # Název protiúčtu
+        'sender_bank': 'column12',  # Název banky
+        'sender_account': 'column2',  # Protiúčet
+        'currency': 'column14',  # Měna
+        'information': 'column16',  # Zpráva pro příjemce
+        'variable_symbol': 'column5',  # VS
+        'type': 'column8',  # Typ
+        'issued_by': 'column9',  # Provedl
+    }
+
+    throttling_delay = 30  # in seconds, FIO accepts one request per token in 30 seconds
+    max_retries = 2
+
+    def request(self, url, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            response = requests.get(url, timeout=commerce_settings.BANK_API_TIMEOUT, **kwargs)
+
+            # 409 Conflict: too many requests with the same token
+            if response.status_code != 409 or attempt == self.max_retries:
+                break
+
+            time.sleep(self.throttling_delay)
+
+        response.raise_for_status()
+        return response
+
+    def reset_cursor(self, cursor):
+        if cursor not in EMPTY_VALUES:
+            self.request(f'{self.api_url}/set-last-id/{self.token}/{cursor}/')
+
+    def get_transactions(self, cursor=None):
+        # only transactions since the last download
+        response = self.request(f'{self.api_url}/last/{self.token}/transactions.json', stream=True)
+
+        if ijson:
+            response.raw.decode_content = True
+            transaction_list = ijson.items(response.raw, 'accountStatement.transactionList.transaction.item')
+        else:
+            transaction_list = response.json()['accountStatement']['transactionList']['transaction'] or []
+
+        for t in transaction_list:
+            yield self.parse_transaction(t)
+
+    def parse_transaction(self, t):
+        transaction = {}
+
+        for key, column in self.mapping.items():
+            value = t[column]['value'] if t.get(column) is not None else None
+            transaction[key] = Decimal(str(value)) if key == 'value' else value
+
+        transaction['id'] = str(transaction['id'])
+        transaction['date'] = transaction['date'][:10] if transaction['date'] else None
+        return transaction
+
+
+class FileStatementAdapter(BankAdapter):
+    """
+    Reads transactions from local CSV statement with columns named as keys of normalised transaction
+    (e.g. exported statement, or offline reconciliation)
+    """
+    def __init__(self, path, name='FILE', delimiter=','):
+        super().__init__(token=None)
+        self.path = path
+        self.name = name
+        self.delimiter = delimiter
+
+    def get_transactions(self, cursor=None):
+        # already stored transactions are skipped on save, cursor is not needed
+        with open(self.path, newline='', encoding='utf-8') as statement:
+            for row in csv.DictReader(statement, delimiter=self.delimiter):
+                transaction = {key: row.get(key) or None for key in FioBankAdapter.mapping.keys()}
+                transaction['value'] = Decimal(transaction['value']) if transaction['value'] else None
+                yield transaction
+
+
+def get_bank_adapter():
+    if commerce_settings.BANK_API_TOKEN in EMPTY_VALUES:
+        raise ValueError('Missing bank API token')
+
+    if commerce_settings.BANK_API in EMPTY_VALUES:
+        raise ValueError('Missing bank API')
+
+    try:
+        adapter_class = import_string(commerce_settings.BANK_ADAPTERS[commerce_settings.BANK_API])
+    except KeyError:
+        raise NotImplementedError(f'Bank API {commerce_settings.BANK_API} not implemented')
+
+    return adapter_class(commerce_settings.BANK_API_TOKEN)
+
+
+def apply_paid_orders(order_ids):
+    """
+    Sets status of paid orders at once, side effects of Order.save() are applied explicitly
+    """
+    from commerce.loyalty import sync_order_loyalty_points
+    from commerce.models import Order
+    from commerce.tasks import notify_about_changed_orders_status
+    from invoicing.models import Invoice
+
+    if not order_ids:
+        return []
+
+    # only orders which are still awaiting payment (both statuses reserve stock)
+    orders = Order.objects.filter(id__in=order_ids, status=Order.STATUS_AWAITING_PAYMENT)
+    paid_ids = list(orders.values_list('id', flat=True))
+    Order.objects.filter(id__in=paid_ids).update(status=Order.STATUS_PAYMENT_RECEIVED, modified=now())
+
+    paid_orders = Order.objects.filter(id__in=paid_ids)
+
+    if commerce_settings.LOYALTY_PROGRAM_ENABLED:
+        for order in paid_orders.exclude(user=None).select_related('discount'):
+            sync_order_loyalty_points(order)
+
+    # see order_status_changed receiver
+    Order.create_invoices(paid_orders.filter(invoices=None), type=Invoice.TYPE.INVOICE, status=Invoice.STATUS.PAID)
+
+    if Order.STATUS_PAYMENT_RECEIVED in commerce_settings.NOTIFY_ABOUT_STATUSES:
+        transaction.on_commit(lambda: notify_about_changed_orders_status.delay(paid_ids))
+
+    return paid_ids
+
+
+def sync_bank_transactions(adapter=None, batch_size=5000, dry_run=False, reset_cursor=False):
+    """
+    Stores new bank transactions and marks orders paid by them (see reconciliation.reconcile).
+
+    Cursor is the ID of the last stored transaction, so every run downloads only new transactions.
+    Banks moving their own mark after every download (FIO) are aligned with it only on request (e.g. after failed sync).
+    """
+    from commerce.models import BankTransaction
+    from commerce.reconciliation import OpenOrderIndex, reconcile, get_paid_order_ids
+
+    adapter = adapter or get_bank_adapter()
+    last_transaction = BankTransaction.objects.filter(bank=adapter.name).order_by('-id').first()
+    cursor = last_transaction.transaction_id if last_transaction else None
+
+    if reset_cursor:
+        adapter.reset_cursor(cursor)
+
+    index = OpenOrderIndex.build()
+    stats = {'transactions': 0, 'paid': 0, 'skipped': 0}
+    batch = []
+    seen_ids = set()
+
+    def process_batch():
+        # already stored transactions (e.g. overlapping statements) are paid amounts of the index already
+        stored_ids = set(BankTransaction.objects
+                         .filter(bank=adapter.name, transaction_id__in=[t['id'] for t in batch])
+                         .values_list('transaction_id', flat=True))
+        new_transactions = []
+
+        for t in batch:
+            if t['id'] in stored_ids or t['id'] in seen_ids:
+                stats['skipped'] += 1
+            else:
+                seen_ids.add(t['id'])
+                new_transactions.append(t)
+
+        matches = reconcile(new_transactions, index)
+
+        for match in matches:
+            stats[match.result.lower()] = stats.get(match.result.lower(), 0) + 1
+
+        if not dry_run:
+            bank_transactions = [BankTransaction(
+                bank=adapter.name,
+                transaction_id=match.transaction['id'],
+                date=match.transaction['date'],
+                value=match.transaction['value'],
+                currency=match.transaction['currency'] or '',
+                variable_symbol=match.transaction['variable_symbol'] or '',
+                sender=match.transaction['sender'] or '',
+                sender_account=match.transaction['sender_account'] or '',
+                sender_bank=match.transaction['sender_bank'] or '',
+                information=match.transaction['information'] or '',
+                type=match.transaction['type'] or '',
+                issued_by=match.transaction['issued_by'] or '',
+                order_id=match.order_id,
+                result=match.result,
+                errors=match.errors,
+            ) for match in matches]
+
+            with transaction.atomic():
+                BankTransaction.objects.bulk_create(bank_transactions, ignore_conflicts=True)
+                stats['paid'] += len(apply_paid_orders(get_paid_order_ids(matches)))
+
+        stats['transactions'] += len(batch)
+        batch.clear()
+
+    for t in adapter.get_transactions(cursor):
+        batch.append(t)
+
+        if len(batch) >= batch_size:
+            process_batch()
+
+    if batch:
+        process_batch()
+
+    return stats
@@ -1,8 +1,12 @@
+from django.utils.functional import SimpleLazyObject
+
+from commerce.discounts import get_promoted_discounts
 from commerce.models import Discount
 
 
 def discount_codes(request):
+    # nothing is loaded until a template touches the variables
     return {
-        'valid_promoted_discount_codes': Discount.objects.valid().promoted().infinite().order_by('valid_until'),
+        'valid_promoted_discount_codes': SimpleLazyObject(get_promoted_discounts),
         'discount_codes': Discount.objects.all()
     }
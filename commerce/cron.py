@@ -8,11 +8,26 @@ def cancel_unpaid_orders():
     jobs.cancel_unpaid_orders.delay()
 
 
+def sync_bank_transactions():
+    from commerce import jobs
+    jobs.sync_bank_transactions.delay()
+
+
 def delete_old_empty_carts():
     from commerce import jobs
     jobs.delete_old_empty_carts.delay()
 
 
+def delete_abandoned_carts():
+    from commerce import jobs
+    jobs.delete_abandoned_carts.delay()
+
+
+def send_abandoned_cart_reminders():
+    from commerce import jobs
+    jobs.send_abandoned_cart_reminders.delay()
+
+
 def send_loyalty_reminders():
     from commerce import jobs
     jobs.send_loyalty_reminders.delay()
@@ -0,0 +1,148 @@
+from django.core.cache import cache
+from django.utils.timezone import now
+
+from commerce import settings as commerce_settings
+
+DISCOUNT_INDEX_CACHE_KEY = 'commerce_discount_index'
+DISCOUNT_INDEX_VERSION_CACHE_KEY = 'commerce_discount_index_version'
+PROMOTED_DISCOUNTS_CACHE_KEY = 'commerce_promoted_discounts'
+
+
+class DiscountIndex(object):
+    """
+    Eligibility of discounts for products.
+
+    Maps product (content type, object id) to its specific discounts and content type to discounts
+    without specific products. Discounts without products and content types are applicable to everything.
+    """
+    def __init__(self, product_discounts, content_type_discounts, general_discounts, version=None):
+        self.product_discounts = product_discounts
+        self.content_type_discounts = content_type_discounts
+        self.general_discounts = general_discounts
+        self.version = version
+
+    @classmethod
+    def build(cls, version=None):
+        from commerce.models import Discount
+
+        product_discounts = {}
+        content_type_discounts = {}
+
+        # gm2m stores primary keys of products as strings
+        for discount_id, content_type_id, object_id in Discount.products.through.objects.values_list('gm2m_src_id', 'gm2m_ct_id', 'gm2m_pk'):
+            product_discounts.setdefault((content_type_id, str(object_id)), set()).add(discount_id)
+
+        discounts_with_products = set().union(*product_discounts.values())
+        discounts_with_content_types = set()
+
+        for discount_id, content_type_id in Discount.content_types.through.objects.values_list('discount_id', 'contenttype_id'):
+            discounts_with_content_types.add(discount_id)
+
+            # discounts of specific products are not applicable to whole content type
+            if discount_id not in discounts_with_products:
+                content_type_discounts.setdefault(content_type_id, set()).add(discount_id)
+
+        general_discounts = set(Discount.objects.values_list('id', flat=True)) - discounts_with_products - discounts_with_content_types
+
+        return cls(product_discounts, content_type_discounts, general_discounts, version)
+
+    def get_discount_ids(self, content_type_id, object_id):
+        return self.product_discounts.get((content_type_id, str(object_id)), set()) | \
+            self.content_type_discounts.get(content_type_id, set()) | \
+            self.general_discounts
+
+
+def get_discount_index():
+    cached = cache.get_many([DISCOUNT_INDEX_CACHE_KEY, DISCOUNT_INDEX_VERSION_CACHE_KEY])
+    index = cached.get(DISCOUNT_INDEX_CACHE_KEY)
+    version = cached.get(DISCOUNT_INDEX_VERSION_CACHE_KEY)
+
+    # index built before discounts changed (even if it was stored after invalidation)
+    if index is None or getattr(index, 'version', None) != version:
+        index = DiscountIndex.build(version)
+        cache.set(DISCOUNT_INDEX_CACHE_KEY, index, commerce_settings.DISCOUNT_INDEX_CACHE_TIMEOUT)
+
+    return index
+
+
+def invalidate_discount_index():
+    # Note: gm2m does not send any signal when products are added, call this after discount.products.add() outside of admin
+    cache.add(DISCOUNT_INDEX_VERSION_CACHE_KEY, 0, None)
+    cache.incr(DISCOUNT_INDEX_VERSION_CACHE_KEY)
+
+
+def get_promoted_discounts():
+    """
+    Valid, promoted and infinite discounts ordered by their expiration
+    """
+    discounts = cache.get(PROMOTED_DISCOUNTS_CACHE_KEY)
+
+    if discounts is None:
+        from commerce.models import Discount
+        discounts = list(Discount.objects.valid().promoted().infinite().order_by('valid_until'))
+        timeout = commerce_settings.PROMOTED_DISCOUNTS_CACHE_TIMEOUT
+        valid_until = [discount.valid_until for discount in discounts if discount.valid_until]
+
+        # expire together with the first discount
+        if valid_until:
+            timeout = min(timeout, max(int((min(valid_until) - now()).total_seconds()) + 1, 1))
+
+        cache.set(PROMOTED_DISCOUNTS_CACHE_KEY, discounts, timeout)
+
+    current_time = now()
+    return [discount for discount in discounts if not discount.valid_until or discount.valid_until >= current_time]
+
+
+def invalidate_promoted_discounts():
+    cache.delete(PROMOTED_DISCOUNTS_CACHE_KEY)
+
+
+def get_request_discounts(request):
+    """
+    Cart discount of the user and valid promoted discounts, loaded once per request
+    """
+    memo = getattr(request, '_commerce_discounts', None)
+
+    if memo is None:
+        from commerce.models import Cart
+
+        cart_discount = None
+        user = getattr(request, 'user', None)
+
+        if user is not None and user.is_authenticated:
+            cart_discount = Cart.get_for_request(request).discount
+
+        memo = {
+            'cart_discount': cart_discount,
+            'promoted_discounts': get_promoted_discounts(),
+        }
+        request._commerce_discounts = memo
+
+    return memo
+
+
+def get_discounts_for_products(request, products):
+    """
+    Returns discount of every product shown to the user: {product_pk: discount}
+    """
+    from commerce.models import Discount
+
+    products = list(products)
+    request_discounts = get_request_discounts(request)
+    valid_discounts_of_products = Discount.objects.valid().for_products(products)
+    discounts = {}
+
+    for product in products:
+        valid_product_discounts = valid_discounts_of_products[product]
+        valid_ids = {discount.id for discount in valid_product_discounts}
+
+        # promoted discount
+        discount = next((d for d in request_discounts['promoted_discounts'] if d.id in valid_ids), None)
+
+        # cart discount
+        if request_discounts['cart_discount']:
+            discount = request_discounts['cart_discount']
+
+        discounts[product.pk] = discount if discount and discount.id in valid_ids else None
+
+    return discounts
@@ -10,8 +10,9 @@ from django.urls import reverse
 from django.utils.safestring import mark_safe
 
 from commerce import settings as commerce_settings
-from commerce.models import Cart, Discount
+from commerce.models import Cart, Discount, ShippingOption
 from commerce.loyalty import available_points
+from commerce.shipping import get_shipping_matrix
 
 from django.utils.translation import gettext_lazy as _
 
@@ -81,13 +82,12 @@ class DiscountCodeForm(forms.ModelForm):
                 if discount.is_used:
                     raise ValidationError(_('Discount code %s was used already') % discount.code)
 
-                if discount.max_items is not None and self.instance.item_set.count() > discount.max_items:
+                if discount.max_items is not None and len(self.instance.pricing.items) > discount.max_items:
                     raise ValidationError(_('Discount code %s can be applied to at most %d items') % (discount.code, discount.max_items))
 
                 if discount.products.exists():
-                    cart = Cart.get_for_user(self.user)
-
-                    if not cart.has_item(list(discount.products.all())):
+                    # form instance is the cart of the user
+                    if not self.instance.has_item(list(discount.products.all())):
                         raise ValidationError(_('Discount product is not in the cart'))
 
             except ObjectDoesNotExist:
@@ -209,8 +209,11 @@ class ShippingAndPaymentForm(forms.ModelForm):
         self.fields['shipping_option'].label = ''
         self.fields['payment_method'].label = ''
 
+        shipping_matrix = get_shipping_matrix()
+        shipping_options = self.instance.shipping_options
+
         # shipping options
-        self.fields['shipping_option'].queryset = self.instance.shipping_options
+        self.fields['shipping_option'].queryset = ShippingOption.objects.for_country(self.instance.delivery_country)
 
         payment_method_fieldset = None
         shipping_option_fieldset = None
@@ -219,7 +222,7 @@ class ShippingAndPaymentForm(forms.ModelForm):
             shipping_option_fieldset = Fieldset(
                     _('Select Shipping Option'),
                     'shipping_option',
-                    HTML(loader.get_template('commerce/fees.html').render({'fees': self.fields['shipping_option'].queryset})),
+                    HTML(loader.get_template('commerce/fees.html').render({'fees': shipping_options})),
                     css_class=f'col-md-6'
                 )
         else:
@@ -229,7 +232,7 @@ class ShippingAndPaymentForm(forms.ModelForm):
             payment_method_fieldset = Fieldset(
                 _('Choose Payment Type'),
                 'payment_method',
-                HTML(loader.get_template('commerce/fees.html').render({'fees': self.fields['payment_method'].queryset})),
+                HTML(loader.get_template('commerce/fees.html').render({'fees': shipping_matrix.payment_methods})),
                 css_class='col-md-6'
             )
         else:
@@ -253,7 +256,7 @@ class ShippingAndPaymentForm(forms.ModelForm):
         shipping_option = self.cleaned_data.get('shipping_option', None)
         payment_method = self.cleaned_data.get('payment_method', None)
 
-        if payment_method and shipping_option and shipping_option not in payment_method.shippings.all():
+        if payment_method and shipping_option and not get_shipping_matrix().is_payment_method_allowed(payment_method, shipping_option):
             raise ValidationError(_('This payment method is not available for shipping option %s') % shipping_option)
 
         return payment_method
@@ -0,0 +1,57 @@
+import hashlib
+import os
+import threading
+
+from Crypto.PublicKey import RSA
+from Crypto.Signature import PKCS1_v1_5
+from OpenSSL import crypto
+
+from commerce import settings as commerce_settings
+
+
+class KeyStore(object):
+    """
+    Process level cache of loaded keys.
+
+    Key files are parsed (and decrypted) once and reloaded only when their modification time or password changes.
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.keys = {}  # {(kind, path, password digest): (mtime, key)}
+
+    def get(self, kind, path, loader, password=None):
+        mtime = os.stat(path).st_mtime
+        cache_key = (kind, path, hashlib.sha256(password).hexdigest() if password else None)
+        cached = self.keys.get(cache_key)
+
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with self.lock:
+            # loaded by another thread meanwhile
+            cached = self.keys.get(cache_key)
+
+            if cached and cached[0] == mtime:
+                return cached[1]
+
+            with open(path, 'r') as key_file:
+                key = loader(key_file.read())
+
+            self.keys[cache_key] = (mtime, key)
+            return key
+
+    def clear(self):
+        with self.lock:
+            self.keys.clear()
+
+
+key_store = KeyStore()
+
+
+def get_private_key():
+    password = commerce_settings.GATEWAY_GP_PRIVATE_KEY_PASSWORD.encode('ascii')
+    return key_store.get('private', commerce_settings.GATEWAY_GP_PRIVATE_KEY_PATH, lambda key: crypto.load_privatekey(crypto.FILETYPE_PEM, key, password), password)
+
+
+def get_public_key_verifier():
+    return key_store.get('public', commerce_settings.GATEWAY_GP_PUBLIC_KEY_PATH, lambda key: PKCS1_v1_5.new(RSA.importKey(key)))
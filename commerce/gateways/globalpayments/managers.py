@@ -1,14 +1,17 @@
 import base64
+from datetime import timedelta
 
 import unidecode
 from Crypto.Hash import SHA1
-from Crypto.PublicKey import RSA
-from Crypto.Signature import PKCS1_v1_5
 from OpenSSL import crypto
+from django.core.cache import cache
+from django.utils.functional import cached_property
 from django.utils.http import urlencode
 from django.utils.safestring import mark_safe
+from django.utils.timezone import now
 
 from commerce import settings as commerce_settings
+from commerce.gateways.globalpayments.keys import get_private_key, get_public_key_verifier
 from commerce.gateways.globalpayments.models import Payment, Result
 from commerce.managers import PaymentManager as CommercePaymentManager
 from commerce.models import Order
@@ -28,6 +31,13 @@ class PaymentManager(CommercePaymentManager):
         return ''
 
     def get_payment_url(self):
+        # signed URL of open payment is reused (see payment)
+        cache_key = f'commerce_gp_payment_url_{self.payment.id}_{self.order.total_in_cents}'
+        payment_url = cache.get(cache_key)
+
+        if payment_url is not None:
+            return payment_url
+
         # get payment data from order details
         payment_data = self.payment_data
 
@@ -39,24 +49,37 @@ class PaymentManager(CommercePaymentManager):
         params = urlencode(payment_data)
         url = self.get_gateway_url()
         payment_url = f'{url}?{params}'
+        cache.set(cache_key, payment_url, commerce_settings.GATEWAY_GP_PAYMENT_TTL)
         return payment_url
 
     def get_gateway_url(self):
         debug = commerce_settings.GATEWAY_GP_DEBUG
         return commerce_settings.GATEWAY_GP_URL_TEST if debug else commerce_settings.GATEWAY_GP_URL
 
+    @cached_property
+    def payment(self):
+        """
+        Open payment of order: created within TTL and without any result from gateway yet, otherwise new one
+        """
+        threshold = now() - timedelta(seconds=commerce_settings.GATEWAY_GP_PAYMENT_TTL)
+
+        payment = Payment.objects\
+            .filter(order=self.order, status=Payment.STATUS_PROCESSING, created__gte=threshold, result=None)\
+            .order_by('-created')\
+            .first()
+
+        return payment or Payment.objects.create(order=self.order)
+
     @property
     def payment_data(self):
-        payment = Payment.objects.create(order=self.order)
-
-        description = ', '.join([str(item) for item in self.order.purchaseditem_set.all()])
+        description = ', '.join([str(item) for item in self.order.get_purchased_items_with_products()])
         description = unidecode.unidecode(description)
 
         return {
             'order': self.order,
             'MERCHANTNUMBER': commerce_settings.GATEWAY_GP_MERCHANT_NUMBER,
             'OPERATION': 'CREATE_ORDER',
-            'ORDERNUMBER': self.get_order_number_from_payment_id(payment.id),
+            'ORDERNUMBER': self.get_order_number_from_payment_id(self.payment.id),
             'AMOUNT': self.order.total_in_cents,
             'CURRENCY': '',  # empty value is default value of payment gateway merchant eshop
             'DEPOSITFLAG': 1,
@@ -77,17 +100,8 @@ class PaymentManager(CommercePaymentManager):
         return digest
 
     def sign(self, data):
-        private_key = {
-            'path': commerce_settings.GATEWAY_GP_PRIVATE_KEY_PATH,
-            'password': commerce_settings.GATEWAY_GP_PRIVATE_KEY_PASSWORD
-        }
-
-        with open(private_key['path'], "r") as key_file:
-            key = key_file.read()
-
-        password = private_key['password'].encode('ascii')
-
-        pkey = crypto.load_privatekey(crypto.FILETYPE_PEM, key, password)
+        # decrypted once per process (see keys.KeyStore)
+        pkey = get_private_key()
         signed_data = crypto.sign(pkey, data, "sha1")
         signed_data_encoded = base64.b64encode(signed_data)
         return signed_data_encoded.decode("utf-8")
@@ -100,9 +114,7 @@ class PaymentManager(CommercePaymentManager):
         param: signature String signature to be verified
         return: Boolean. True if the signature is valid; False otherwise.
         '''
-        pub_key = open(commerce_settings.GATEWAY_GP_PUBLIC_KEY_PATH, "r").read()
-        rsakey = RSA.importKey(pub_key)
-        signer = PKCS1_v1_5.new(rsakey)
+        signer = get_public_key_verifier()
         digest = SHA1.new()
         digest.update(data.encode("utf-8"))
         return signer.verify(digest, base64.b64decode(signature))
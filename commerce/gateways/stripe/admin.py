@@ -1,7 +1,9 @@
 import stripe
-from django.contrib import admin
+from django.contrib import admin, messages
 from commerce import settings as commerce_settings
-from commerce.gateways.stripe.models import Customer
+from commerce.gateways.stripe.models import Customer, StripeEvent
+
+from django.utils.translation import gettext_lazy as _
 
 stripe.api_key = commerce_settings.GATEWAY_STRIPE_SECRET_API_KEY
 
@@ -39,3 +41,21 @@ class CustomerAdmin(admin.ModelAdmin):
 
             # SCA
             # https://stripe.com/docs/billing/migration/strong-customer-authentication
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    date_hierarchy = 'stripe_created'
+    search_fields = ['event_id', 'order_number']
+    list_display = ('event_id', 'type', 'order_number', 'status', 'attempts', 'stripe_created', 'created', 'processed')
+    list_filter = ['status', 'type']
+    readonly_fields = ['event_id', 'type', 'payload', 'order_number', 'error', 'attempts', 'stripe_created', 'created', 'processed']
+    ordering = ['-stripe_created']
+    actions = ['replay']
+
+    def replay(self, request, queryset):
+        from commerce.gateways.stripe.jobs import process_stripe_events
+        total = queryset.update(status=StripeEvent.STATUS_PENDING)
+        process_stripe_events.delay()
+        messages.info(request, _('%d events will be processed again') % total)
+    replay.short_description = _('Replay events')
@@ -0,0 +1,94 @@
+import stripe
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils.timezone import now
+
+from commerce.gateways.stripe.models import Customer, StripeEvent
+from commerce.models import Order
+
+
+def handle_customer_created(event):
+    customer = event.data.object
+    user = get_user_model().objects.get(email=customer.email)
+    Customer.objects.update_or_create(user=user, defaults={'stripe_id': customer.id})
+
+
+def handle_payment_intent_succeeded(event):
+    intent = event.data.object  # contains a stripe.PaymentIntent
+    customer = Customer.objects.get(stripe_id=intent.customer)
+    customer.payment_method = intent.payment_method
+    customer.save(update_fields=['payment_method'])
+
+
+def handle_checkout_session_completed(event):
+    session = event.data.object
+
+    if session.payment_status == 'paid':
+        order = Order.objects.get(number=int(session.client_reference_id))
+
+        # replayed or repeated event does not change order anymore
+        if order.status == Order.STATUS_AWAITING_PAYMENT:
+            order.status = Order.STATUS_PAYMENT_RECEIVED
+            order.save(update_fields=['status'])
+
+
+# Note: charge.succeeded does not need handling, customer doesn't have to be created yet
+HANDLERS = {
+    'customer.created': handle_customer_created,
+    'payment_intent.succeeded': handle_payment_intent_succeeded,
+    'checkout.session.completed': handle_checkout_session_completed,
+}
+
+
+def process_event(stripe_event):
+    handler = HANDLERS.get(stripe_event.type)
+
+    if handler is None:
+        return StripeEvent.STATUS_IGNORED
+
+    handler(stripe.Event.construct_from(stripe_event.payload, stripe.api_key))
+    return StripeEvent.STATUS_PROCESSED
+
+
+def process_pending_events(batch_size=100):
+    """
+    Processes pending events in batches, in order of their creation at Stripe.
+
+    Every batch is locked (SKIP LOCKED, so more workers can run at once). Events of the order with earlier
+    pending event are left for later batch, so events of the same order are never handled out of order.
+    """
+    total = 0
+
+    while True:
+        with transaction.atomic():
+            earlier_pending_events = StripeEvent.objects.filter(
+                status=StripeEvent.STATUS_PENDING,
+                order_number=OuterRef('order_number'),
+                stripe_created__lt=OuterRef('stripe_created'),
+            )
+
+            events = list(StripeEvent.objects
+                          .filter(status=StripeEvent.STATUS_PENDING)
+                          .exclude(Exists(earlier_pending_events))
+                          .select_for_update(skip_locked=True)
+                          .order_by('stripe_created', 'id')[:batch_size])
+
+            if not events:
+                return total
+
+            for stripe_event in events:
+                try:
+                    with transaction.atomic():
+                        stripe_event.status = process_event(stripe_event)
+                        stripe_event.error = ''
+                except Exception as e:
+                    stripe_event.status = StripeEvent.STATUS_FAILED
+                    stripe_event.error = repr(e)
+
+                stripe_event.attempts += 1
+                stripe_event.processed = now()
+
+            StripeEvent.objects.bulk_update(events, ['status', 'error', 'attempts', 'processed'])
+
+        total += len(events)
@@ -0,0 +1,9 @@
+from django_rq import job
+
+from commerce import settings as commerce_settings
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def process_stripe_events():
+    from commerce.gateways.stripe.events import process_pending_events
+    return process_pending_events()
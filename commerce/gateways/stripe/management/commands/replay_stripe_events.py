@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from commerce.gateways.stripe.events import process_pending_events
+from commerce.gateways.stripe.models import StripeEvent
+
+
+class Command(BaseCommand):
+    help = 'Processes stored Stripe events again'
+
+    def add_arguments(self, parser):
+        parser.add_argument('event_ids', nargs='*', help='IDs of events (all failed events by default)')
+        parser.add_argument('--type', help='only events of given type')
+        parser.add_argument('--all', action='store_true', help='also already processed events')
+
+    def handle(self, *args, **options):
+        events = StripeEvent.objects.all()
+
+        if options['event_ids']:
+            events = events.filter(event_id__in=options['event_ids'])
+        elif not options['all']:
+            events = events.filter(status=StripeEvent.STATUS_FAILED)
+
+        if options['type']:
+            events = events.filter(type=options['type'])
+
+        total = events.update(status=StripeEvent.STATUS_PENDING)
+        processed = process_pending_events()
+        failed = StripeEvent.objects.filter(status=StripeEvent.STATUS_FAILED).count()
+        self.stdout.write(self.style.SUCCESS(f'{total} events replayed, {processed} events processed, {failed} failed events in total'))
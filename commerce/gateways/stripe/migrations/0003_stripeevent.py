@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stripe', '0002_customer_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeEvent',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.CharField(max_length=255, unique=True, verbose_name='event ID')),
+                ('type', models.CharField(db_index=True, max_length=100, verbose_name='type')),
+                ('payload', models.JSONField(verbose_name='payload')),
+                ('order_number', models.PositiveIntegerField(blank=True, db_index=True, default=None, null=True, verbose_name='order number')),
+                ('status', models.CharField(choices=[('PENDING', 'pending'), ('PROCESSED', 'processed'), ('IGNORED', 'ignored'), ('FAILED', 'failed')], db_index=True, default='PENDING', max_length=9, verbose_name='status')),
+                ('error', models.TextField(blank=True, verbose_name='error')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='attempts')),
+                ('stripe_created', models.DateTimeField(db_index=True, verbose_name='created at Stripe')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created')),
+                ('processed', models.DateTimeField(blank=True, default=None, null=True, verbose_name='processed')),
+            ],
+            options={
+                'verbose_name': 'Stripe event',
+                'verbose_name_plural': 'Stripe events',
+                'ordering': ('stripe_created',),
+                'get_latest_by': 'stripe_created',
+            },
+        ),
+    ]
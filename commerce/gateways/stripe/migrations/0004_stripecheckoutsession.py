@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0058_banktransaction_results'),
+        ('stripe', '0003_stripeevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StripeCheckoutSession',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=255, unique=True, verbose_name='session ID')),
+                ('line_items_hash', models.CharField(max_length=64, verbose_name='line items hash')),
+                ('url', models.TextField(blank=True, verbose_name='URL')),
+                ('expires_at', models.DateTimeField(verbose_name='expires at')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created')),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='commerce.order', verbose_name='order')),
+            ],
+            options={
+                'verbose_name': 'checkout session',
+                'verbose_name_plural': 'checkout sessions',
+                'ordering': ('created',),
+                'get_latest_by': 'created',
+                'indexes': [models.Index(fields=['order', 'line_items_hash', 'expires_at'], name='stripe_session_lookup')],
+            },
+        ),
+    ]
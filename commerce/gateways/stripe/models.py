@@ -19,3 +19,56 @@ class Customer(models.Model):
 
     def __str__(self):
         return str(self.user)
+
+
+class StripeEvent(models.Model):
+    STATUS_PENDING = 'PENDING'
+    STATUS_PROCESSED = 'PROCESSED'
+    STATUS_IGNORED = 'IGNORED'
+    STATUS_FAILED = 'FAILED'
+    STATUSES = [
+        (STATUS_PENDING, _('pending')),
+        (STATUS_PROCESSED, _('processed')),
+        (STATUS_IGNORED, _('ignored')),
+        (STATUS_FAILED, _('failed')),
+    ]
+    event_id = models.CharField(_('event ID'), max_length=255, unique=True)
+    type = models.CharField(_('type'), max_length=100, db_index=True)
+    payload = models.JSONField(_('payload'))
+    order_number = models.PositiveIntegerField(_('order number'), blank=True, null=True, default=None, db_index=True)
+    status = models.CharField(_('status'), choices=STATUSES, max_length=9, default=STATUS_PENDING, db_index=True)
+    error = models.TextField(_('error'), blank=True)
+    attempts = models.PositiveSmallIntegerField(_('attempts'), default=0)
+    stripe_created = models.DateTimeField(_('created at Stripe'), db_index=True)
+    created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
+    processed = models.DateTimeField(_('processed'), blank=True, null=True, default=None)
+
+    class Meta:
+        verbose_name = _('Stripe event')
+        verbose_name_plural = _('Stripe events')
+        ordering = ('stripe_created',)
+        get_latest_by = 'stripe_created'
+
+    def __str__(self):
+        return self.event_id
+
+
+class StripeCheckoutSession(models.Model):
+    order = models.ForeignKey('commerce.Order', verbose_name=_('order'), on_delete=models.CASCADE)
+    session_id = models.CharField(_('session ID'), max_length=255, unique=True)
+    line_items_hash = models.CharField(_('line items hash'), max_length=64)
+    url = models.TextField(_('URL'), blank=True)
+    expires_at = models.DateTimeField(_('expires at'))
+    created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('checkout session')
+        verbose_name_plural = _('checkout sessions')
+        ordering = ('created',)
+        get_latest_by = 'created'
+        indexes = [
+            models.Index(fields=['order', 'line_items_hash', 'expires_at'], name='stripe_session_lookup'),
+        ]
+
+    def __str__(self):
+        return self.session_id
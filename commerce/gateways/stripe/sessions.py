@@ -0,0 +1,97 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+
+import stripe
+from django.utils.module_loading import import_string
+from django.utils.timezone import now
+
+from commerce import settings as commerce_settings
+from commerce.gateways.stripe.models import StripeCheckoutSession
+from commerce.models import Discount
+
+from django.utils.translation import gettext as _
+
+
+def get_stripe_client():
+    # Stripe module by default, a local fake can be configured for tests or benchmarks
+    if commerce_settings.GATEWAY_STRIPE_CLIENT:
+        return import_string(commerce_settings.GATEWAY_STRIPE_CLIENT)
+
+    return stripe
+
+
+def get_line_item(name, unit_amount, quantity=1):
+    return {
+        'price_data': {
+            'currency': commerce_settings.CURRENCY.lower(),
+            'unit_amount': unit_amount,
+            'product_data': {
+                'name': str(name),
+            },
+        },
+        'quantity': quantity,
+    }
+
+
+def build_line_items(order):
+    if (order.loyalty_points_used > 0 or order.discount and order.discount.unit == Discount.UNIT_CURRENCY) or not commerce_settings.UNIT_PRICE_IS_WITH_TAX:
+        # Stripe does not support items with negative amount (credit)
+        return [get_line_item('%s %s' % (_('Order number'), str(order)), order.total_in_cents)]
+
+    # products are loaded in one query per content type
+    line_items = [
+        get_line_item(purchaseditem.title_with_option, int(purchaseditem.price * 100), purchaseditem.quantity)
+        for purchaseditem in order.get_purchased_items_with_products()
+    ]
+
+    if order.shipping_fee > 0:
+        line_items.append(get_line_item(_('Shipping fee'), int(order.shipping_fee * 100)))
+
+    if order.payment_fee > 0:
+        line_items.append(get_line_item(_('Payment fee'), int(order.payment_fee * 100)))
+
+    return line_items
+
+
+def get_line_items_hash(line_items):
+    return hashlib.sha256(json.dumps(line_items, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def get_checkout_session(order, success_url, cancel_url, customer=None, customer_email=None, client=None):
+    """
+    Returns open checkout session of order with the same line items, or creates new one
+    """
+    line_items = build_line_items(order)
+    line_items_hash = get_line_items_hash(line_items)
+
+    # session has to stay open long enough to finish the payment
+    session = StripeCheckoutSession.objects\
+        .filter(order=order, line_items_hash=line_items_hash, expires_at__gt=now() + timedelta(minutes=commerce_settings.GATEWAY_STRIPE_SESSION_EXPIRATION_MARGIN))\
+        .order_by('-created')\
+        .first()
+
+    if session:
+        return session
+
+    client = client or get_stripe_client()
+
+    # TODO: billing
+    checkout_session = client.checkout.Session.create(
+        customer=customer.stripe_id if customer else None,
+        customer_email=customer_email if not customer else None,
+        client_reference_id=order.number,
+        payment_method_types=['card'],
+        line_items=line_items,
+        mode='payment',
+        success_url=success_url,
+        cancel_url=cancel_url,
+    )
+
+    return StripeCheckoutSession.objects.create(
+        order=order,
+        session_id=checkout_session.id,
+        line_items_hash=line_items_hash,
+        url=checkout_session.get('url') or '',
+        expires_at=datetime.fromtimestamp(checkout_session.expires_at, tz=timezone.utc)
+    )
@@ -1,8 +1,9 @@
 import json
+from datetime import datetime, timezone
+
 import stripe
 from django.contrib import messages
-from django.contrib.auth import get_user_model
-
+from django.db import transaction
 from django.http import HttpResponse
 from django.shortcuts import redirect
 from django.urls import reverse
@@ -11,8 +12,10 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.generic import DetailView
 
 from commerce import settings as commerce_settings
-from commerce.gateways.stripe.models import Customer
-from commerce.models import Order, Discount
+from commerce.gateways.stripe.jobs import process_stripe_events
+from commerce.gateways.stripe.models import StripeEvent
+from commerce.gateways.stripe.sessions import get_checkout_session
+from commerce.models import Order
 
 from django.utils.translation import gettext_lazy as _
 
@@ -45,85 +48,18 @@ class StripeCreateSessionView(DetailView):
         except:
             customer = None
 
-        line_items = []
-
-        if (order.loyalty_points_used > 0 or order.discount and order.discount.unit == Discount.UNIT_CURRENCY) or not commerce_settings.UNIT_PRICE_IS_WITH_TAX:
-            # Stripe does not support items with negative amount (credit)
-            line_items.append({
-                'price_data': {
-                    'currency': commerce_settings.CURRENCY.lower(),
-                    'unit_amount': order.total_in_cents,
-                    'product_data': {
-                        'name': '%s %s' % (_('Order number'), str(order)),
-                    },
-                },
-                'quantity': 1,
-            })
-        else:
-            for purchaseditem in order.purchaseditem_set.all():
-                line_items.append({
-                    'price_data': {
-                        'currency': commerce_settings.CURRENCY.lower(),
-                        'unit_amount': int(purchaseditem.price * 100),
-                        'product_data': {
-                            'name': purchaseditem.title_with_option,
-                        },
-                    },
-                    'quantity': purchaseditem.quantity,
-                })
-
-            if order.shipping_fee > 0:
-                line_items.append({
-                    'price_data': {
-                        'currency': commerce_settings.CURRENCY.lower(),
-                        'unit_amount': int(order.shipping_fee * 100),
-                        'product_data': {
-                            'name': _('Shipping fee'),
-                        },
-                    },
-                    'quantity': 1,
-                })
-
-            if order.payment_fee > 0:
-                line_items.append({
-                    'price_data': {
-                        'currency': commerce_settings.CURRENCY.lower(),
-                        'unit_amount': int(order.payment_fee * 100),
-                        'product_data': {
-                            'name': _('Payment fee'),
-                        },
-                    },
-                    'quantity': 1,
-                })
-
-            # stripe does not support negative items !!!
-            # if order.loyalty_points_used > 0:
-            #     line_items.append({
-            #         'price_data': {
-            #             'currency': commerce_settings.CURRENCY.lower(),
-            #             'unit_amount': -int(points_to_currency_unit(order.loyalty_points_used) * 100),
-            #             'product_data': {
-            #                 'name': _('Credit'),
-            #             },
-            #         },
-            #         'quantity': 1,
-            #     })
-
         try:
-            # TODO: billing
-            checkout_session = stripe.checkout.Session.create(
-                customer=customer.stripe_id if customer else None,
-                customer_email=request.user.email if not customer else None,
-                client_reference_id=order.number,
-                payment_method_types=['card'],
-                line_items=line_items,
-                mode='payment',
+            # open session with the same line items is reused
+            checkout_session = get_checkout_session(
+                order,
                 success_url=request.build_absolute_uri(reverse('commerce:stripe_success_payment')),
                 cancel_url=request.build_absolute_uri(reverse('commerce:stripe_cancel_payment')),
+                customer=customer,
+                customer_email=request.user.email,
             )
             # TODO: check functionality
             # return redirect(checkout_session.url)
-            return HttpResponse(json.dumps({'id': checkout_session.id}), status=200)
+            return HttpResponse(json.dumps({'id': checkout_session.session_id}), status=200)
         except Exception as e:
             print('ERROR', e)
             return HttpResponse(content=json.dumps({'error': str(e)}), status=403)
@@ -161,45 +97,17 @@ class StripeWebhookView(View):
             # Invalid signature
             return HttpResponse(status=400)
 
-        # Handle the event
-        if event.type == 'payment_intent.created':
-            print('PaymentIntent was created!')
-
-        elif event.type == 'payment_method.attached':
-            print('PaymentMethod was attached to a Customer!')
-
-        elif event.type == 'charge.succeeded':
-            print('Charge was successful!')
-
-            # customer doesn't have to be created yet!
-            # charge = event.data.object  # contains a stripe.Charge
-            # customer = Customer.objects.get(stripe_id=charge.customer)
-            # customer.payment_method = charge.payment_method
-            # customer.save(update_fields=['payment_method'])
-
-        elif event.type == 'customer.created':
-            print('Customer was created!')
-            customer = event.data.object
-            user = get_user_model().objects.get(email=customer.email)
-            Customer.objects.update_or_create(user=user, defaults={'stripe_id': customer.id})
-
-        elif event.type == 'payment_intent.succeeded':
-            print('PaymentIntent was successful!')
-            intent = event.data.object  # contains a stripe.PaymentIntent
-            customer = Customer.objects.get(stripe_id=intent.customer)
-            customer.payment_method = intent.payment_method
-            customer.save(update_fields=['payment_method'])
-
-        elif event.type == 'checkout.session.completed':
-            print('Checkout Session was completed!')
-            session = event.data.object
-
-            if session.payment_status == 'paid':
-                order_number = int(session.client_reference_id)
-                order = Order.objects.get(number=order_number)
-                order.status = Order.STATUS_PAYMENT_RECEIVED
-                order.save(update_fields=['status'])
-        else:
-            print('Unhandled event type {}'.format(event.type))
+        # persist event (repeated deliveries are ignored) and handle it in background
+        data_object = event.data.object
+        order_number = data_object.get('client_reference_id') if event.type.startswith('checkout.session.') else None
+
+        StripeEvent.objects.bulk_create([StripeEvent(
+            event_id=event.id,
+            type=event.type,
+            payload=json.loads(payload),
+            order_number=int(order_number) if order_number and str(order_number).isdigit() else None,
+            stripe_created=datetime.fromtimestamp(event.created, tz=timezone.utc),
+        )], ignore_conflicts=True)
 
+        transaction.on_commit(process_stripe_events.delay)
         return HttpResponse(status=200)
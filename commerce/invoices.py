@@ -0,0 +1,42 @@
+from django.core.cache import caches
+from django.db.models import Max
+from django.utils.translation import get_language
+from invoicing import utils as invoicing_utils
+
+from commerce import settings as commerce_settings
+
+
+def get_invoice_pdf_cache_key(invoice):
+    # any change of invoice or its items creates new version
+    items_modified = getattr(invoice, 'items_modified', None)
+    version = f'{invoice.modified.timestamp()}-{items_modified.timestamp() if items_modified else 0}'
+    return f'commerce_invoice_pdf_{invoice.pk}_{version}_{get_language()}'
+
+
+def get_invoices_in_pdf(invoices):
+    """
+    Returns the same export files as invoicing.utils.get_invoices_in_pdf, rendering every invoice version once.
+
+    Invoices rendered in the current language are cached in COMMERCE_INVOICE_PDF_CACHE (its backend takes care
+    of size bounded eviction), so all mails of the same order reuse them.
+    """
+    cache = caches[commerce_settings.INVOICE_PDF_CACHE]
+    invoices = list(invoices.annotate(items_modified=Max('item__modified')))
+    keys = {invoice.pk: get_invoice_pdf_cache_key(invoice) for invoice in invoices}
+    export_files = cache.get_many(keys.values())
+    missing_invoices = [invoice for invoice in invoices if keys[invoice.pk] not in export_files]
+
+    rendered_files = {}
+
+    for invoice in missing_invoices:
+        # one by one: file names (invoice numbers) are not unique
+        invoice_files = invoicing_utils.get_invoices_in_pdf([invoice])
+
+        if invoice_files:
+            rendered_files[keys[invoice.pk]] = invoice_files[0]
+
+    if rendered_files:
+        cache.set_many(rendered_files, commerce_settings.INVOICE_PDF_CACHE_TIMEOUT)
+        export_files.update(rendered_files)
+
+    return [export_files[keys[invoice.pk]] for invoice in invoices if keys[invoice.pk] in export_files]
@@ -1,72 +1,280 @@
+import logging
+import time
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils.timezone import now
+from django.utils.translation import gettext as _, override as override_language
 from django_rq import job
 from commerce import settings as commerce_settings
-from commerce.loyalty import unused_points, send_loyalty_reminder
+from commerce.loyalty import sync_order_loyalty_points, with_unused_points
+
+logger = logging.getLogger(__name__)
 
 
 @job(commerce_settings.REDIS_QUEUE)
-def send_order_reminders():
+def send_order_reminders(chunk_size=None, in_parallel=False):
+    """
+    Sends reminders of old unpaid orders in chunks (optionally as parallel jobs).
+
+    Every chunk marks its orders as reminded right after sending, so interrupted run resumes with not reminded orders.
+    """
     from commerce.models import Order
-    unpaid_old_orders = Order.objects\
+    chunk_size = chunk_size or commerce_settings.ORDER_REMINDERS_CHUNK_SIZE
+    order_ids = list(Order.objects
+                     .not_reminded()
+                     .awaiting_payment()
+                     .old(days=commerce_settings.OLD_ORDER_REMIND_THRESHOLD)
+                     .order_by('id')
+                     .values_list('id', flat=True))
+    total_orders = len(order_ids)
+    logger.info('Found %s old unpaid orders without reminder', total_orders)
+
+    for start in range(0, total_orders, chunk_size):
+        chunk = order_ids[start:start + chunk_size]
+
+        if in_parallel:
+            send_order_reminders_chunk.delay(chunk)
+        else:
+            sent = send_order_reminders_chunk(chunk)
+            logger.info('Reminded %s/%s orders (%s sent)', start + len(chunk), total_orders, sent)
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def send_order_reminders_chunk(order_ids):
+    from commerce.mails import MailBatch
+    from commerce.models import Order
+
+    orders = Order.objects\
+        .filter(id__in=order_ids)\
         .not_reminded()\
         .awaiting_payment()\
-        .old(days=commerce_settings.OLD_ORDER_REMIND_THRESHOLD)
-    total_orders = unpaid_old_orders.count()
-    print(f'Found {total_orders} old unpaid orders without reminder')
+        .select_related('user')\
+        .order_by('id')
+
+    batch = MailBatch('commerce/mails/order_reminder')
+    message_orders = {}
+    orders_by_language = {}
+    free_ids = []
+
+    for order in orders:
+        # reminder of free order is not needed (see Order.send_reminder)
+        if order.total > 0:
+            orders_by_language.setdefault(order.user.preferred_language, []).append(order)
+        else:
+            free_ids.append(order.id)
+
+    # free orders are not selected again by following runs
+    Order.objects.filter(id__in=free_ids).update(reminder_sent=now())
 
-    for order in unpaid_old_orders:
-        print(order, order.created.date(), order.total, order.user)
-        order.send_reminder()
+    for language, language_orders in orders_by_language.items():
+        with override_language(language):
+            for order in language_orders:
+                message = batch.add(order.user, _('Order reminder: %d') % order.number, data={'order': order})
+                message_orders[message] = order.id
+
+    sent_ids = []
+
+    try:
+        sent = batch.send(on_sent=lambda message: sent_ids.append(message_orders[message]))
+    finally:
+        # orders reminded before connection failure are not reminded again
+        Order.objects.filter(id__in=sent_ids).update(reminder_sent=now())
+
+    return sent
 
 
 @job(commerce_settings.REDIS_QUEUE)
-def cancel_unpaid_orders():
+def cancel_unpaid_orders(batch_size=None):
+    """
+    Cancels old unpaid orders in batches, every batch in its own short transaction.
+
+    Orders locked by other transactions (e.g. just being paid) are skipped, interrupted run resumes
+    with remaining orders next time.
+    """
     from commerce.models import Order
+    from commerce.stock import apply_orders_stock_delta
+    from commerce.tasks import notify_about_changed_orders_status
     from invoicing.models import Invoice
 
+    batch_size = batch_size or commerce_settings.CANCEL_UNPAID_ORDERS_BATCH_SIZE
     unpaid_old_orders = Order.objects\
         .awaiting_payment()\
         .old(days=commerce_settings.OLD_ORDER_CANCEL_THRESHOLD)
     total_orders = unpaid_old_orders.count()
-    print(f'Found {total_orders} old unpaid orders')
+    logger.info('Found %s old unpaid orders', total_orders)
 
-    for order in unpaid_old_orders:
-        print(order, order.created.date(), order.total, order.user)
-        order.status = Order.STATUS_CANCELLED
-        order.save(update_fields=['status'])
+    cancelled_orders = 0
+    cancelled_invoices = 0
 
-        # cancel invoices
-        for invoice in order.invoices.filter(
+    while True:
+        with transaction.atomic():
+            order_ids = list(unpaid_old_orders
+                             .select_for_update(skip_locked=True)
+                             .order_by('id')
+                             .values_list('id', flat=True)[:batch_size])
+
+            if not order_ids:
+                break
+
+            # bulk update does not send signals: stock, loyalty points and notifications are handled here
+            Order.objects.filter(id__in=order_ids).update(status=Order.STATUS_CANCELLED, modified=now())
+            apply_orders_stock_delta(order_ids, -1)
+
+            # cancel invoices
+            cancelled_invoices += Invoice.objects.filter(
+                purchases__in=order_ids,
                 type=Invoice.TYPE.INVOICE,
                 status__in=[
                     Invoice.STATUS.NEW,
                     Invoice.STATUS.SENT,
-                    Invoice.STATUS.RETURNED]):
-            invoice.status = Invoice.STATUS.CANCELED
-            invoice.save(update_fields=['status'])
+                    Invoice.STATUS.RETURNED]
+            ).update(status=Invoice.STATUS.CANCELED)
+
+            # return spent points
+            if commerce_settings.LOYALTY_PROGRAM_ENABLED:
+                for order in Order.objects.filter(id__in=order_ids, loyalty_points__gt=0).exclude(user=None).select_related('discount'):
+                    sync_order_loyalty_points(order)
+
+            if Order.STATUS_CANCELLED in commerce_settings.NOTIFY_ABOUT_STATUSES:
+                transaction.on_commit(lambda order_ids=order_ids: notify_about_changed_orders_status.delay(order_ids))
+
+        cancelled_orders += len(order_ids)
+        logger.info('Cancelled %s/%s orders, %s invoices', cancelled_orders, total_orders, cancelled_invoices)
+
+    return {'orders': cancelled_orders, 'invoices': cancelled_invoices}
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def sync_bank_transactions(reset_cursor=False):
+    from commerce.banks import sync_bank_transactions as sync
+
+    stats = sync(reset_cursor=reset_cursor)
+    logger.info('Bank transactions synced: %s', stats)
+    return stats
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def reconcile_bank_statement(path, bank='FILE', dry_run=False):
+    from commerce.banks import sync_bank_transactions as sync, FileStatementAdapter
+
+    stats = sync(adapter=FileStatementAdapter(path, name=bank), dry_run=dry_run)
+    logger.info('Bank statement %s reconciled: %s', path, stats)
+    return stats
 
 
 @job(commerce_settings.REDIS_QUEUE)
 def delete_old_empty_carts():
     from commerce.models import Cart
 
-    empty_old_carts = Cart.objects.old().empty()
-    total_carts = empty_old_carts.count()
-    print(f'Found {total_carts} old empty carts')
-    empty_old_carts.delete()
+    empty_old_carts = Cart.objects.old(days=commerce_settings.EMPTY_CART_DELETE_THRESHOLD).empty()
+    total_carts = empty_old_carts.delete_in_batches()
+    logger.info('Deleted %s old empty carts', total_carts)
+    return total_carts
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def delete_abandoned_carts():
+    from commerce.models import Cart
+
+    if commerce_settings.ABANDONED_CART_DELETE_THRESHOLD is None:
+        return 0
+
+    abandoned_carts = Cart.objects.abandoned(days=commerce_settings.ABANDONED_CART_DELETE_THRESHOLD)
+    total_carts = abandoned_carts.delete_in_batches()
+    logger.info('Deleted %s abandoned carts', total_carts)
+    return total_carts
+
+
+@job(commerce_settings.REDIS_QUEUE)
+def send_abandoned_cart_reminders():
+    """
+    Reminds not empty carts without recent activity, at most COMMERCE_ABANDONED_CART_REMINDERS_PER_RUN carts per run.
+
+    Every chunk is marked as reminded right after sending, carts over the limit are reminded next run.
+    """
+    from commerce.mails import MailBatch
+    from commerce.models import Cart, Item
+
+    counters = {'reminded': 0, 'sent': 0}
+
+    if not commerce_settings.ABANDONED_CART_REMINDERS_ENABLED:
+        return counters
+
+    cart_ids = list(Cart.objects
+                    .abandoned()
+                    .not_reminded()
+                    .order_by('last_activity')
+                    .values_list('id', flat=True)[:commerce_settings.ABANDONED_CART_REMINDERS_PER_RUN])
+    chunk_size = commerce_settings.ABANDONED_CART_REMINDERS_CHUNK_SIZE
+
+    for start in range(0, len(cart_ids), chunk_size):
+        if start and commerce_settings.ABANDONED_CART_REMINDERS_CHUNK_DELAY:
+            time.sleep(commerce_settings.ABANDONED_CART_REMINDERS_CHUNK_DELAY)
+
+        carts = Cart.objects\
+            .filter(id__in=cart_ids[start:start + chunk_size])\
+            .not_reminded()\
+            .select_related('user')\
+            .prefetch_related(Prefetch('item_set', queryset=Item.objects.select_related('option').prefetch_related('product')))
+
+        batch = MailBatch('commerce/mails/abandoned_cart_reminder')
+        reminded_ids = []
+
+        for cart in sorted(carts, key=lambda cart: cart.user.preferred_language or ''):
+            with override_language(cart.user.preferred_language):
+                batch.add(cart.user, _('Your shopping cart is waiting'), data={'cart': cart})
+
+            reminded_ids.append(cart.id)
+
+        counters['sent'] += batch.send()
+        counters['reminded'] += Cart.objects.filter(id__in=reminded_ids).update(abandoned_reminder_sent=now())
+
+    logger.info('Abandoned cart reminders: %s', counters)
+    return counters
 
 
 @job(commerce_settings.REDIS_QUEUE)
 def send_loyalty_reminders():
+    """
+    Reminds unused loyalty points to users with orders exactly 7 days old.
+
+    Points of all candidates are computed by a single query, mails are sent in chunks per language.
+    """
+    from commerce.mails import MailBatch
     from commerce.models import Order
+
+    counters = {'orders': 0, 'candidates': 0, 'reminded': 0, 'sent': 0}
+
+    if not commerce_settings.LOYALTY_PROGRAM_ENABLED:
+        return counters
+
     days = 7  # TODO: setting
     orders = Order.objects\
         .with_earned_loyalty_points()\
         .old(days=days, interval='exact')
-    total_orders = orders.count()
+    counters['orders'] = orders.count()
+
+    users = with_unused_points(get_user_model().objects.filter(id__in=orders.values('user')))
+    counters['candidates'] = users.count()
+    users_by_language = {}
+
+    for user in users.filter(unused_loyalty_points__gt=0).order_by('id'):
+        users_by_language.setdefault(user.preferred_language, []).append(user)
+
+    chunk_size = commerce_settings.LOYALTY_REMINDERS_CHUNK_SIZE
+
+    for language, language_users in users_by_language.items():
+        with override_language(language):
+            for start in range(0, len(language_users), chunk_size):
+                batch = MailBatch('commerce/mails/order_loyalty_reminder')
+
+                for user in language_users[start:start + chunk_size]:
+                    batch.add(user, _('Loyalty points'), data={'points': user.unused_loyalty_points})
 
-    print(f'Found {total_orders} orders with loyalty points {days} old exactly days')
-    users = get_user_model().objects.filter(id__in=orders.values('user')).distinct()
+                counters['reminded'] += len(batch.messages)
+                counters['sent'] += batch.send()
 
-    for user in users:
-        send_loyalty_reminder(user)
+    logger.info('Loyalty reminders: %s', counters)
+    return counters
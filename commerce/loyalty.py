@@ -1,6 +1,10 @@
 from decimal import Decimal
 
+from django.core.cache import cache
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Sum, Q, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.translation import override as override_language
 from commerce import settings as commerce_settings
 from pragmatic.managers import EmailManager
@@ -13,19 +17,118 @@ except ImportError:
     from django.utils.translation import gettext_lazy as _
 
 
+def get_balance_cache_key(user_id):
+    return f'commerce_loyalty_balance_{user_id}'
+
+
+def invalidate_balance(user_id):
+    transaction.on_commit(lambda: cache.delete(get_balance_cache_key(user_id)))
+
+
+def get_transactions_summary(transactions):
+    from commerce.models import LoyaltyTransaction
+
+    # reversals of earned points are negative, reversals of spent points are positive
+    return transactions.aggregate(
+        earned=Coalesce(Sum('points', filter=Q(type=LoyaltyTransaction.TYPE_EARN) | Q(type=LoyaltyTransaction.TYPE_REVERSAL, points__lt=0)), 0),
+        spent=Coalesce(-Sum('points', filter=Q(type=LoyaltyTransaction.TYPE_SPEND) | Q(type=LoyaltyTransaction.TYPE_REVERSAL, points__gt=0)), 0),
+        balance=Coalesce(Sum('points'), 0),
+    )
+
+
 def earned_points(user):
-    return sum([order.loyalty_points_earned for order in user.order_set.with_earned_loyalty_points()])
+    return get_transactions_summary(user.loyaltytransaction_set.all())['earned']
 
 
 def spent_points(user):
-    return sum([order.loyalty_points_used for order in user.order_set.with_spent_loyalty_points()])
+    return get_transactions_summary(user.loyaltytransaction_set.all())['spent']
+
+
+def balance(user):
+    key = get_balance_cache_key(user.pk)
+    points = cache.get(key)
+
+    if points is None:
+        points = user.loyaltytransaction_set.aggregate(balance=Coalesce(Sum('points'), 0))['balance']
+        cache.set(key, points, None)
+
+    return points
+
+
+def sync_order_loyalty_points(order):
+    """
+    Writes loyalty transactions of order, so they match its current status, total and used points
+    """
+    from commerce.models import LoyaltyTransaction
+
+    if order.user_id is None:
+        return
+
+    recorded = get_transactions_summary(LoyaltyTransaction.objects.filter(order=order))
+    earned_delta = order.loyalty_points_earned - recorded['earned']
+    spent = order.loyalty_points_used if order.spends_loyalty_points else 0
+    spent_delta = spent - recorded['spent']
+    transactions = []
+
+    if earned_delta != 0:
+        transactions.append(LoyaltyTransaction(
+            user_id=order.user_id,
+            order=order,
+            type=LoyaltyTransaction.TYPE_EARN if earned_delta > 0 else LoyaltyTransaction.TYPE_REVERSAL,
+            points=earned_delta
+        ))
+
+    if spent_delta != 0:
+        transactions.append(LoyaltyTransaction(
+            user_id=order.user_id,
+            order=order,
+            type=LoyaltyTransaction.TYPE_SPEND if spent_delta > 0 else LoyaltyTransaction.TYPE_REVERSAL,
+            points=-spent_delta
+        ))
+
+    if transactions:
+        LoyaltyTransaction.objects.bulk_create(transactions)
+        invalidate_balance(order.user_id)
+
+    return transactions
+
+
+def rebuild_loyalty_transactions():
+    """
+    Recreates loyalty transactions of all orders (expirations are kept)
+    """
+    from commerce.models import LoyaltyTransaction, Order
+
+    with transaction.atomic():
+        user_ids = set(LoyaltyTransaction.objects.values_list('user_id', flat=True).distinct())
+        LoyaltyTransaction.objects.exclude(type=LoyaltyTransaction.TYPE_EXPIRE).delete()
+        total = 0
+
+        orders = Order.objects\
+            .exclude(user=None)\
+            .select_related('discount')\
+            .prefetch_related('purchaseditem_set')\
+            .order_by('created')
+
+        for order in orders.iterator(chunk_size=500):
+            if order.total is None:
+                # totals are not stored yet (see 0061_order_totals_backfill migration)
+                order.calculate_totals()
+                Order.objects.filter(pk=order.pk).update(**{field: getattr(order, field) for field in Order.TOTALS_FIELDS})
+
+            if sync_order_loyalty_points(order):
+                user_ids.add(order.user_id)
+                total += 1
+
+        for user_id in user_ids:
+            invalidate_balance(user_id)
+
+    return total
 
 
 def available_points(cart):
     items_subtotal = cart.items_subtotal
-    user_earned_points = earned_points(cart.user)
-    user_spent_points = spent_points(cart.user)
-    user_available_points = user_earned_points - user_spent_points
+    user_available_points = balance(cart.user)
     user_available_points_in_currency_unit = points_to_currency_unit(user_available_points)
 
     if user_available_points_in_currency_unit > items_subtotal:
@@ -35,11 +138,8 @@ def available_points(cart):
 
 
 def unused_points(user):
-    # earned points
-    points = earned_points(user)
-
-    # spent points
-    points -= spent_points(user)
+    # earned points without spent points
+    points = balance(user)
 
     # cart points
     try:
@@ -51,6 +151,24 @@ def unused_points(user):
     return points
 
 
+def with_unused_points(users):
+    """
+    Annotates users with their unused points (the same as unused_points) computed in a single query
+    """
+    from commerce.models import LoyaltyTransaction
+
+    balances = LoyaltyTransaction.objects\
+        .filter(user=OuterRef('pk'))\
+        .order_by()\
+        .values('user')\
+        .annotate(balance=Sum('points'))\
+        .values('balance')
+
+    return users.annotate(
+        unused_loyalty_points=Coalesce(Subquery(balances), 0) - Coalesce(F('cart__loyalty_points'), 0)
+    )
+
+
 def points_to_currency_unit(points):
     return round(Decimal(points * commerce_settings.CURRENCY_UNITS_PER_LOYALTY_POINT), 2)
 
@@ -0,0 +1,73 @@
+from django.conf import settings
+from django.contrib.sites.shortcuts import get_current_site
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.validators import EMPTY_VALUES
+from django.template import loader, TemplateDoesNotExist
+
+from pragmatic.managers import EmailManager
+
+
+class MailBatch(object):
+    """
+    Builds mails the same way as EmailManager.send_mail and sends them over a single connection.
+
+    Templates and current site are loaded once for the whole batch.
+    """
+    def __init__(self, template_prefix):
+        self.template = self.get_template(f'{template_prefix}.txt')
+        self.html_template = self.get_template(f'{template_prefix}.html')
+        self.site = get_current_site(None)
+        self.messages = []
+
+    @staticmethod
+    def get_template(template_name):
+        try:
+            return loader.get_template(template_name)
+        except TemplateDoesNotExist:
+            return None
+
+    def add(self, to, subject, data=None):
+        context = {
+            'subject': subject,
+            'request': None,
+            'site': self.site,
+            'settings': settings,
+            'recipient': to
+        }
+
+        if data:
+            context.update(data)
+
+        email = EmailMultiAlternatives(
+            subject=str(subject),
+            body=self.template.render(context) if self.template else '',
+            from_email=settings.DEFAULT_FROM_EMAIL,
+            to=EmailManager.get_recipients(to)
+        )
+
+        html_message = self.html_template.render(context) if self.html_template else ''
+
+        if html_message not in EMPTY_VALUES:
+            email.attach_alternative(html_message, 'text/html')
+
+        self.messages.append(email)
+        return email
+
+    def send(self, on_sent=None):
+        """
+        Sends messages one by one over a single connection, on_sent(message) is called after every sent message
+        """
+        if not self.messages:
+            return 0
+
+        sent = 0
+
+        with get_connection() as connection:
+            for message in self.messages:
+                if connection.send_messages([message]):
+                    sent += 1
+
+                    if on_sent:
+                        on_sent(message)
+
+        return sent
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from commerce.numbering import SequenceOrderNumberAllocator
+
+
+class Command(BaseCommand):
+    help = 'Sets increment of order number sequence to COMMERCE_ORDER_NUMBER_BLOCK_SIZE and moves it past existing orders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--block-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        allocator = SequenceOrderNumberAllocator(block_size=options['block_size'])
+        next_number = allocator.align_sequence()
+        self.stdout.write(self.style.SUCCESS(f'Sequence {allocator.sequence_name} increments by {allocator.block_size}, next number is {next_number}'))
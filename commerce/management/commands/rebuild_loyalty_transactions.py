@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from commerce.loyalty import rebuild_loyalty_transactions
+
+
+class Command(BaseCommand):
+    help = 'Recreates loyalty transactions of historical orders'
+
+    def handle(self, *args, **options):
+        total = rebuild_loyalty_transactions()
+        self.stdout.write(self.style.SUCCESS(f'Loyalty transactions created for {total} orders'))
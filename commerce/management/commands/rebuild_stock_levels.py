@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from commerce.stock import rebuild_stock_levels
+
+
+class Command(BaseCommand):
+    help = 'Recalculates stock levels from supplies and purchased items'
+
+    def handle(self, *args, **options):
+        total = rebuild_stock_levels()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} stock levels'))
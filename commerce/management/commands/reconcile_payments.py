@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from commerce.banks import sync_bank_transactions, FileStatementAdapter
+
+
+class Command(BaseCommand):
+    help = 'Matches incoming bank transactions with orders awaiting payment'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--statement', help='path to CSV statement (instead of bank API)')
+        parser.add_argument('--bank', default='FILE', help='bank name of CSV statement')
+        parser.add_argument('--dry-run', action='store_true', help='do not store transactions nor change orders')
+
+    def handle(self, *args, **options):
+        adapter = FileStatementAdapter(options['statement'], name=options['bank']) if options['statement'] else None
+        stats = sync_bank_transactions(adapter=adapter, dry_run=options['dry_run'])
+        self.stdout.write(self.style.SUCCESS(', '.join(f'{key}: {value}' for key, value in stats.items())))
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Sum, F
+
+from commerce.models import Order, PurchasedItem
+
+
+class Command(BaseCommand):
+    help = 'Recalculates stored totals of orders (e.g. after change of taxation settings)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='recalculate totals of all orders')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        orders = Order.objects.all() if options['all'] else Order.objects.filter(total=None)
+        order_ids = list(orders.order_by('id').values_list('id', flat=True))
+        batch_size = options['batch_size']
+
+        for start in range(0, len(order_ids), batch_size):
+            batch_ids = order_ids[start:start + batch_size]
+
+            items_subtotals = dict(PurchasedItem.objects
+                                   .filter(order_id__in=batch_ids)
+                                   .values('order')
+                                   .annotate(subtotal=Sum(F('quantity') * F('price')))
+                                   .order_by()
+                                   .values_list('order', 'subtotal'))
+
+            batch = list(Order.objects.filter(id__in=batch_ids).select_related('discount'))
+
+            for order in batch:
+                order.calculate_totals(items_subtotal=items_subtotals.get(order.id) or 0)
+
+            Order.objects.bulk_update(batch, Order.TOTALS_FIELDS)
+
+        self.stdout.write(self.style.SUCCESS(f'Totals updated for {len(order_ids)} orders'))
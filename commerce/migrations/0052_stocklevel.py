@@ -0,0 +1,67 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Sum
+
+
+def populate_stock_levels(apps, schema_editor):
+    Supply = apps.get_model('commerce', 'Supply')
+    PurchasedItem = apps.get_model('commerce', 'PurchasedItem')
+    StockLevel = apps.get_model('commerce', 'StockLevel')
+    levels = {}
+
+    for supply in Supply.objects.values('content_type', 'object_id', 'option').annotate(quantity=Sum('quantity')).order_by():
+        key = (supply['content_type'], supply['object_id'], supply['option'])
+        levels.setdefault(key, {'supplies': 0, 'purchased': 0})['supplies'] = supply['quantity']
+
+    purchased_items = PurchasedItem.objects\
+        .exclude(order__status__in=['CANCELLED', 'REFUNDED', 'PARTIALLY_REFUNDED'])\
+        .values('content_type', 'object_id', 'option')\
+        .annotate(quantity=Sum('quantity'))\
+        .order_by()
+
+    for item in purchased_items:
+        key = (item['content_type'], item['object_id'], item['option'])
+        levels.setdefault(key, {'supplies': 0, 'purchased': 0})['purchased'] = item['quantity']
+
+    StockLevel.objects.bulk_create([
+        StockLevel(content_type_id=content_type_id, object_id=object_id, option_id=option_id, **quantities)
+        for (content_type_id, object_id, option_id), quantities in levels.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('commerce', '0051_alter_discount_products_alter_order_delivery_city_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLevel',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_id', models.PositiveIntegerField()),
+                ('supplies', models.IntegerField(default=0, verbose_name='supplies')),
+                ('purchased', models.IntegerField(default=0, verbose_name='purchased')),
+                ('modified', models.DateTimeField(auto_now=True, verbose_name='modified')),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('option', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.CASCADE, to='commerce.option')),
+            ],
+            options={
+                'verbose_name': 'stock level',
+                'verbose_name_plural': 'stock levels',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.UniqueConstraint(fields=('content_type', 'object_id', 'option'), name='unique_stock_level'),
+        ),
+        migrations.AddConstraint(
+            model_name='stocklevel',
+            constraint=models.UniqueConstraint(condition=models.Q(('option', None)), fields=('content_type', 'object_id'), name='unique_stock_level_without_option'),
+        ),
+        migrations.RunPython(populate_stock_levels, migrations.RunPython.noop),
+    ]
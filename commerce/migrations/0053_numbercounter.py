@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0052_stocklevel'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=30, unique=True, verbose_name='name')),
+                ('last_number', models.PositiveIntegerField(verbose_name='last number')),
+            ],
+            options={
+                'verbose_name': 'number counter',
+                'verbose_name_plural': 'number counters',
+            },
+        ),
+    ]
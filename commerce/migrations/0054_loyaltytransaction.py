@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('commerce', '0053_numbercounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LoyaltyTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('EARN', 'earn'), ('SPEND', 'spend'), ('EXPIRE', 'expire'), ('REVERSAL', 'reversal')], db_index=True, max_length=8, verbose_name='type')),
+                ('points', models.IntegerField(help_text='negative value lowers the balance', verbose_name='points')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created')),
+                ('order', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='commerce.order', verbose_name='order')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='user')),
+            ],
+            options={
+                'verbose_name': 'loyalty transaction',
+                'verbose_name_plural': 'loyalty transactions',
+                'ordering': ('created',),
+            },
+        ),
+    ]
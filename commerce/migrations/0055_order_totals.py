@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0054_loyaltytransaction'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='credit',
+            field=models.DecimalField(blank=True, decimal_places=2, default=None, help_text='EUR', max_digits=10, null=True, verbose_name='credit'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='items_subtotal',
+            field=models.DecimalField(blank=True, decimal_places=2, default=None, help_text='EUR', max_digits=10, null=True, verbose_name='items subtotal'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='tax',
+            field=models.DecimalField(blank=True, decimal_places=2, default=None, help_text='EUR', max_digits=10, null=True, verbose_name='tax'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(blank=True, db_index=True, decimal_places=2, default=None, help_text='EUR', max_digits=10, null=True, verbose_name='total'),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_in_cents',
+            field=models.PositiveIntegerField(blank=True, default=None, null=True, verbose_name='total in cents'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def populate_last_activity(apps, schema_editor):
+    Cart = apps.get_model('commerce', 'Cart')
+    Cart.objects.update(last_activity=models.F('modified'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0055_order_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cart',
+            name='abandoned_reminder_sent',
+            field=models.DateTimeField(blank=True, default=None, null=True, verbose_name='abandoned reminder sent'),
+        ),
+        migrations.AddField(
+            model_name='cart',
+            name='last_activity',
+            field=models.DateTimeField(default=django.utils.timezone.now, help_text='items added or removed', verbose_name='last activity'),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['last_activity'], name='commerce_cart_last_activity'),
+        ),
+        migrations.AddIndex(
+            model_name='cart',
+            index=models.Index(fields=['abandoned_reminder_sent', 'last_activity'], name='commerce_cart_abandoned'),
+        ),
+        migrations.RunPython(populate_last_activity, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:28
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0056_cart_last_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BankTransaction',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bank', models.CharField(max_length=16, verbose_name='bank')),
+                ('transaction_id', models.CharField(max_length=64, verbose_name='transaction ID')),
+                ('date', models.DateField(blank=True, default=None, null=True, verbose_name='date')),
+                ('value', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='value')),
+                ('currency', models.CharField(blank=True, max_length=3, verbose_name='currency')),
+                ('variable_symbol', models.CharField(blank=True, db_index=True, max_length=20, verbose_name='variable symbol')),
+                ('sender', models.CharField(blank=True, max_length=255, verbose_name='sender')),
+                ('sender_account', models.CharField(blank=True, max_length=64, verbose_name='sender account')),
+                ('sender_bank', models.CharField(blank=True, max_length=255, verbose_name='sender bank')),
+                ('information', models.TextField(blank=True, verbose_name='information')),
+                ('type', models.CharField(blank=True, max_length=100, verbose_name='type')),
+                ('issued_by', models.CharField(blank=True, max_length=100, verbose_name='issued by')),
+                ('result', models.CharField(choices=[('PAID', 'paid'), ('MISMATCH', 'mismatch'), ('NOT_MATCHED', 'not matched')], db_index=True, max_length=11, verbose_name='result')),
+                ('errors', models.TextField(blank=True, verbose_name='errors')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='created')),
+                ('order', models.ForeignKey(blank=True, default=None, null=True, on_delete=django.db.models.deletion.SET_NULL, to='commerce.order', verbose_name='order')),
+            ],
+            options={
+                'verbose_name': 'bank transaction',
+                'verbose_name_plural': 'bank transactions',
+                'ordering': ('-id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='banktransaction',
+            constraint=models.UniqueConstraint(fields=('bank', 'transaction_id'), name='unique_bank_transaction'),
+        ),
+    ]
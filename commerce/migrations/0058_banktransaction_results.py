@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0057_banktransaction'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='banktransaction',
+            name='result',
+            field=models.CharField(choices=[('PAID', 'paid'), ('PARTIAL', 'partial payment'), ('OVERPAID', 'overpaid'), ('MISMATCH', 'mismatch'), ('SUGGESTED', 'suggested by amount'), ('AMBIGUOUS', 'ambiguous'), ('NOT_MATCHED', 'not matched')], db_index=True, max_length=11, verbose_name='result'),
+        ),
+    ]
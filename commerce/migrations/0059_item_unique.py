@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-18 03:35
+
+from django.db import migrations, models
+
+
+def merge_duplicate_items(apps, schema_editor):
+    Item = apps.get_model('commerce', 'Item')
+    duplicates = Item.objects\
+        .values('cart', 'content_type', 'object_id', 'option')\
+        .annotate(count=models.Count('id'), quantity=models.Sum('quantity'), first_id=models.Min('id'))\
+        .filter(count__gt=1)\
+        .order_by()
+
+    for duplicate in duplicates:
+        items = Item.objects.filter(cart=duplicate['cart'], content_type=duplicate['content_type'], object_id=duplicate['object_id'], option=duplicate['option'])
+        items.exclude(id=duplicate['first_id']).delete()
+        items.update(quantity=duplicate['quantity'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0058_banktransaction_results'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_items, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(fields=('cart', 'content_type', 'object_id', 'option'), name='unique_cart_item'),
+        ),
+        migrations.AddConstraint(
+            model_name='item',
+            constraint=models.UniqueConstraint(condition=models.Q(('option', None)), fields=('cart', 'content_type', 'object_id'), name='unique_cart_item_without_option'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+SEQUENCE_NAME = 'commerce_order_number'  # see numbering.SequenceOrderNumberAllocator
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0059_item_unique'),
+    ]
+
+    operations = [
+        # seeded by settings and existing orders on the first allocation (or by align_order_number_sequence command),
+        # sequence could be already created by previous version of SequenceOrderNumberAllocator
+        migrations.RunSQL(
+            f'CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME}',
+            f'DROP SEQUENCE IF EXISTS {SEQUENCE_NAME}'
+        ),
+    ]
@@ -0,0 +1,64 @@
+from django.db import migrations
+from django.db.models import Sum, F
+
+from commerce.loyalty import points_to_currency_unit
+from commerce.mixins import TaxationMixin
+
+BATCH_SIZE = 500
+
+
+class OrderTaxation(TaxationMixin):
+    """
+    Taxation of historical order (totals were calculated on read the same way before they were stored)
+    """
+    def __init__(self, order):
+        self.vat_id = order.vat_id
+        self.shipping_fee = order.shipping_fee
+        self.payment_fee = order.payment_fee
+
+
+def calculate_totals(order, items_subtotal):
+    # see Order.calculate_totals()
+    credit = points_to_currency_unit(order.loyalty_points)
+
+    if order.discount and order.discount.unit == 'CURRENCY':
+        credit += order.discount.amount
+
+    order.items_subtotal = items_subtotal
+    order.credit = credit
+    order.total, order.tax = OrderTaxation(order).compute_tax_breakdown(max(items_subtotal - credit, 0))
+    order.total_in_cents = int(order.total * 100)
+
+
+def populate_order_totals(apps, schema_editor):
+    Order = apps.get_model('commerce', 'Order')
+    PurchasedItem = apps.get_model('commerce', 'PurchasedItem')
+    order_ids = list(Order.objects.filter(total=None).order_by('id').values_list('id', flat=True))
+
+    for start in range(0, len(order_ids), BATCH_SIZE):
+        batch_ids = order_ids[start:start + BATCH_SIZE]
+
+        items_subtotals = dict(PurchasedItem.objects
+                               .filter(order_id__in=batch_ids)
+                               .values('order')
+                               .annotate(subtotal=Sum(F('quantity') * F('price')))
+                               .order_by()
+                               .values_list('order', 'subtotal'))
+
+        batch = list(Order.objects.filter(id__in=batch_ids).select_related('discount'))
+
+        for order in batch:
+            calculate_totals(order, items_subtotals.get(order.id) or 0)
+
+        Order.objects.bulk_update(batch, ['items_subtotal', 'credit', 'tax', 'total', 'total_in_cents'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('commerce', '0060_order_number_sequence'),
+    ]
+
+    operations = [
+        migrations.RunPython(populate_order_totals, migrations.RunPython.noop),
+    ]
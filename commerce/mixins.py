@@ -1,52 +1,76 @@
-from django.conf import settings
-from django.utils.module_loading import import_string
-from invoicing.taxation.eu import EUTaxationPolicy
-from invoicing.models import default_supplier
 from commerce import settings as commerce_settings
+from commerce.taxation import get_taxation_policy, get_supplier_vat_id, tax_rate_cache
 
 
 class TaxationMixin(object):
 
     @property
     def taxation_policy(self):
-        taxation_policy = getattr(settings, 'INVOICING_TAXATION_POLICY', None)
+        return get_taxation_policy()
 
-        if taxation_policy is not None:
-            return import_string(taxation_policy)
+    def get_tax_rate(self):
+        return tax_rate_cache.get_tax_rate(self.taxation_policy, get_supplier_vat_id(), self.vat_id)
 
-        supplier_country = default_supplier('country_code')
-        if supplier_country and EUTaxationPolicy.is_in_EU(supplier_country):
-            return EUTaxationPolicy
+    def is_taxed(self):
+        return not commerce_settings.UNIT_PRICE_IS_WITH_TAX and self.taxation_policy and get_supplier_vat_id()
 
-        return None
-
-    @property
-    def total(self):
-        total = self.subtotal
+    def compute_tax_breakdown(self, subtotal):
+        """
+        Returns total and VAT of the subtotal, tax rate is resolved only once
+        """
+        total = subtotal
         total += self.shipping_fee if hasattr(self, 'shipping_fee') else 0
         total += self.payment_fee if hasattr(self, 'payment_fee') else 0
-        supplier_vat_id = default_supplier('vat_id')
 
-        if not commerce_settings.UNIT_PRICE_IS_WITH_TAX and self.taxation_policy and supplier_vat_id and total > 0:
-            tax_rate = self.taxation_policy.get_tax_rate(supplier_vat_id, self.vat_id)
+        if not self.is_taxed():
+            return total, None
+
+        tax_rate = self.get_tax_rate()
+
+        if total > 0:
             total += round(self.taxation_policy.calculate_tax(total, tax_rate), 2)
 
             # Note: discount is already calculated in subtotal (item price)
 
-        return total
+        return total, round(self.taxation_policy.calculate_tax(total, tax_rate), 2)
+
+    @property
+    def tax_breakdown(self):
+        return self.compute_tax_breakdown(self.subtotal)
+
+    def calculate_total(self, subtotal):
+        return self.compute_tax_breakdown(subtotal)[0]
+
+    @property
+    def total(self):
+        return self.tax_breakdown[0]
 
     def get_total_display(self):
         return f'{self.total} {commerce_settings.CURRENCY}'
 
+    def calculate_vat(self, total):
+        if self.is_taxed():
+            return round(self.taxation_policy.calculate_tax(total, self.get_tax_rate()), 2)
+
+        return None
+
     @property
     def vat(self):
-        supplier_vat_id = default_supplier('vat_id')
+        return self.tax_breakdown[1]
 
-        if not commerce_settings.UNIT_PRICE_IS_WITH_TAX and self.taxation_policy and supplier_vat_id:
-            tax_rate = self.taxation_policy.get_tax_rate(supplier_vat_id, self.vat_id)
-            return round(self.taxation_policy.calculate_tax(self.total, tax_rate), 2)
+    def get_vat_display(self):
+        return f'{self.vat} {commerce_settings.CURRENCY}'
 
-        return None
 
-    def get_vat_display(self):
-        return f'{self.vat} {commerce_settings.CURRENCY}'
\ No newline at end of file
+class ProductDiscountsMixin(object):
+    """
+    Adds discounts of listed products into context of list views: {product_pk: discount}
+    """
+    def get_context_data(self, **kwargs):
+        from commerce.discounts import get_discounts_for_products
+
+        context_data = super().get_context_data(**kwargs)
+        context_data.update({
+            'product_discounts': get_discounts_for_products(self.request, context_data['object_list'])
+        })
+        return context_data
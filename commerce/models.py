@@ -8,8 +8,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.contrib.postgres.indexes import GinIndex
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator, EMPTY_VALUES
-from django.db import models, transaction
-from django.db.models import Sum, CheckConstraint, Q
+from django.db import models, transaction, IntegrityError
+from django.db.models import CheckConstraint, F, Q, UniqueConstraint
 from django.urls import reverse
 from django.utils.functional import cached_property
 from django.utils.module_loading import import_string
@@ -24,10 +24,11 @@ from modeltrans.fields import TranslationField
 
 from commerce import settings as commerce_settings
 from commerce.helpers import get_product_availability
-from commerce.loyalty import points_to_currency_unit, currency_units_to_points, available_points
-from commerce.querysets import OrderQuerySet, PurchasedItemQuerySet, DiscountCodeQuerySet, ShippingOptionQuerySet, CartQuerySet
+from commerce.invoices import get_invoices_in_pdf
+from commerce.loyalty import points_to_currency_unit, currency_units_to_points, available_points, sync_order_loyalty_points
+from commerce.numbering import get_order_number_allocator
+from commerce.querysets import OrderQuerySet, PurchasedItemQuerySet, DiscountCodeQuerySet, ShippingOptionQuerySet, CartQuerySet, StockLevelQuerySet
 from invoicing.models import Invoice, Item as InvoiceItem
-from invoicing.utils import get_invoices_in_pdf
 from pragmatic.fields import ChoiceArrayField
 from pragmatic.managers import EmailManager
 from pragmatic.mixins import SlugMixin
@@ -70,21 +71,26 @@ class AbstractProduct(models.Model):
         content_type = ContentType.objects.get_for_model(self)
         return reverse('commerce:add_to_cart', args=(content_type.id, self.id))
 
+    @cached_property
+    def stock_level(self):
+        # product querysets can be annotated in bulk by StockLevel.objects.annotate_products()
+        if hasattr(self, 'stock_supplies') and hasattr(self, 'stock_purchased'):
+            return {'supplies': self.stock_supplies or 0, 'purchased': self.stock_purchased or 0}
+
+        return StockLevel.objects.for_product(self).totals()
+
+    @cached_property
+    def option_stock_levels(self):
+        return StockLevel.objects.for_product(self).totals_by_option()
+
     @cached_property
     def total_supplies(self):
-        total_supplies = self.supplies.all().aggregate(sum=Sum('quantity'))['sum']
-        return total_supplies or 0
+        return self.stock_level['supplies']
 
     @cached_property
     def purchased(self):
         # count order items of not cancelled orders
-        purchased_items = PurchasedItem.objects.filter(
-            # product=self
-            content_type=ContentType.objects.get_for_model(self),
-            object_id=self.id
-        ).of_not_cancelled_nor_refunded_orders()
-        quantity = purchased_items.aggregate(sum=Sum('quantity'))['sum']
-        return quantity or 0
+        return self.stock_level['purchased']
 
     @cached_property
     def in_stock(self):
@@ -234,7 +240,7 @@ class Discount(models.Model):
         if not self.is_valid:
             return False
 
-        if self.max_items is not None and cart.item_set.count() > self.max_items:
+        if self.max_items is not None and len(cart.pricing.items) > self.max_items:
             return False
 
         if self.products.exists():
@@ -283,12 +289,18 @@ class Cart(models.Model, TaxationMixin):
     # Datetimes
     created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
     modified = models.DateTimeField(_('modified'), auto_now=True)
+    last_activity = models.DateTimeField(_('last activity'), help_text=_('items added or removed'), default=now)
+    abandoned_reminder_sent = models.DateTimeField(_('abandoned reminder sent'), blank=True, null=True, default=None)
 
     objects = CartQuerySet.as_manager()
 
     class Meta:
         verbose_name = _('shopping cart')
         verbose_name_plural = _('shopping carts')
+        indexes = [
+            models.Index(fields=['last_activity'], name='commerce_cart_last_activity'),
+            models.Index(fields=['abandoned_reminder_sent', 'last_activity'], name='commerce_cart_abandoned'),
+        ]
 
     def __str__(self):
         return gettext(f'Shopping cart of {self.user}')
@@ -296,6 +308,7 @@ class Cart(models.Model, TaxationMixin):
     @transaction.atomic
     def save(self, *args, **kwargs):
         result = super().save(*args, **kwargs)
+        self.invalidate_pricing()
 
         if self.subtotal < 0 < self.loyalty_points:
             self.update_loyalty_points()
@@ -305,6 +318,17 @@ class Cart(models.Model, TaxationMixin):
     def update_loyalty_points(self):
         self.loyalty_points = available_points(self)
         super().save(update_fields=['loyalty_points'])
+        self.invalidate_pricing()
+
+    @cached_property
+    def pricing(self):
+        from commerce.pricing import CartPricing
+        return CartPricing(self)
+
+    def invalidate_pricing(self):
+        # drop price snapshot after items, discount, fees or loyalty points change
+        self.__dict__.pop('pricing', None)
+        getattr(self, '_prefetched_objects_cache', {}).pop('item_set', None)
 
     def get_absolute_url(self):
         return reverse('commerce:cart')
@@ -313,17 +337,46 @@ class Cart(models.Model, TaxationMixin):
     def get_for_user(cls, user):
         return cls.objects.get_or_create(user=user)[0]
 
+    @classmethod
+    def get_for_request(cls, request):
+        """
+        Cart of the user loaded once per request and shared by views and forms.
+        New cart is not saved until it is changed (see ensure_saved).
+        """
+        cart = getattr(request, '_commerce_cart', None)
+
+        if cart is None:
+            cart = cls.objects.with_pricing_items().filter(user=request.user).first() or cls(user=request.user)
+            request._commerce_cart = cart
+
+        return cart
+
+    def ensure_saved(self):
+        if self.pk is not None:
+            return
+
+        try:
+            with transaction.atomic():
+                self.save(force_insert=True)
+        except IntegrityError:
+            # cart was created by concurrent request of the same user
+            self.pk = Cart.objects.values_list('pk', flat=True).get(user=self.user)
+            self._state.adding = False
+            self.refresh_from_db()
+
     @property
     def shipping_options(self):
-        return ShippingOption.objects.for_country(self.delivery_country)
+        # list of shipping options from shipping matrix, use ShippingOption.objects.for_country() for queryset
+        from commerce.shipping import get_shipping_matrix
+        return get_shipping_matrix().get_shipping_options(self.delivery_country)
 
     @property
     def has_only_free_shipping_options(self):
-        return not self.shipping_options.not_free().exists()
+        return all(shipping_option.fee == 0 for shipping_option in self.shipping_options)
 
     @property
     def shipping_option_selection_required(self):
-        return not self.has_only_free_shipping_options or self.shipping_options.free().count() > 1
+        return not self.has_only_free_shipping_options or len(self.shipping_options) > 1
 
     @property
     def delivery_details_required(self):
@@ -358,21 +411,20 @@ class Cart(models.Model, TaxationMixin):
 
     @property
     def items_subtotal(self):
-        return sum([item.subtotal for item in self.item_set.all()])
+        return self.pricing.items_subtotal
 
     @property
     def subtotal(self):
-        subtotal = self.items_subtotal
+        return self.pricing.subtotal
 
-        # discount
-        if self.discount and self.discount.unit == Discount.UNIT_CURRENCY:
-            subtotal -= self.discount.amount
+    @property
+    def total(self):
+        return self.pricing.total
 
-        # loyalty program
-        subtotal -= points_to_currency_unit(self.loyalty_points_used)
+    @property
+    def vat(self):
+        return self.pricing.vat
 
-        return max(subtotal, 0)
-    
     @property
     def loyalty_points_earned(self):
         return currency_units_to_points(self.total)
@@ -387,7 +439,7 @@ class Cart(models.Model, TaxationMixin):
 
     @property
     def items_quantity(self):
-        return sum([item.quantity for item in self.item_set.all()])
+        return self.pricing.items_quantity
 
     def is_empty(self):
         return self.items_quantity <= 0
@@ -404,61 +456,123 @@ class Cart(models.Model, TaxationMixin):
         return not self.is_empty()
 
     def has_item(self, product_or_list, option=None):
-        if isinstance(product_or_list, list):
-            for product in product_or_list:
-                if self.has_item(product, option):
-                    return True
-            return False
-
-        product = product_or_list
-
-        kwargs = {
-            'content_type': ContentType.objects.get_for_model(product),
-            'object_id': product.id
-        }
-
-        if option:
-            kwargs.update({
-                'option': option
-            })
-
-        return self.item_set.filter(**kwargs).exists()
+        products = product_or_list if isinstance(product_or_list, list) else [product_or_list]
+        return self.pricing.has_item(products, option)
 
     def has_item_of_type(self, model):
-        return self.item_set.filter(
-            content_type=ContentType.objects.get_for_model(model),
-        ).exists()
+        content_type = ContentType.objects.get_for_model(model)
+        return any(item.content_type_id == content_type.id for item in self.pricing.items)
 
     def has_only_digital_goods(self):
         not_digital_goods = filter(
             lambda i: get_product_availability(i.product) != AbstractProduct.AVAILABILITY_DIGITAL_GOODS,
-            self.item_set.all()
+            self.pricing.items
         )
         return len(list(not_digital_goods)) == 0
 
+    def touch(self):
+        # without saving the whole cart; the new activity deserves a new reminder
+        self.last_activity = now()
+        self.abandoned_reminder_sent = None
+        Cart.objects.filter(pk=self.pk).update(last_activity=self.last_activity, abandoned_reminder_sent=None)
+
     def add_item(self, product, option=None):
-        item, created = Item.objects.get_or_create(
+        self.add(product, option)
+        item = self.get_items(product, option).get()
+
+        # call custom signal
+        cart_updated.send(sender=self.__class__, item=item)
+
+        return item
+
+    def get_items(self, product, option=None):
+        return Item.objects.filter(
             cart=self,
             content_type=ContentType.objects.get_for_model(product),
             object_id=product.id,
             option=option
         )
 
-        if not created:
-            item.quantity += 1
-            item.save(update_fields=['quantity'])
+    def items_changed(self):
+        self.invalidate_pricing()
+        self.touch()
 
-        # call custom signal
-        cart_updated.send(sender=self.__class__, item=item)
+    def add(self, product, option=None, quantity=1):
+        """
+        Increases quantity of product in cart by a single UPDATE, item is created only if it is not in cart yet
+        """
+        self.upsert_item(product, option, quantity, {'quantity': F('quantity') + quantity})
 
-        return item
+    def set_quantity(self, product, option=None, quantity=1):
+        if quantity <= 0:
+            return self.remove(product, option, quantity=None)
+
+        self.upsert_item(product, option, quantity, {'quantity': quantity})
+        return True
+
+    def upsert_item(self, product, option, quantity, changes):
+        self.ensure_saved()
+        items = self.get_items(product, option)
+        changes['modified'] = now()
+
+        if not items.update(**changes):
+            try:
+                with transaction.atomic():
+                    Item.objects.create(
+                        cart=self,
+                        content_type=ContentType.objects.get_for_model(product),
+                        object_id=product.id,
+                        option=option,
+                        quantity=quantity
+                    )
+            except IntegrityError:
+                # item was added concurrently (see unique constraints of item)
+                items.update(**changes)
+
+        self.items_changed()
+
+    def remove(self, product, option=None, quantity=1):
+        """
+        Decreases quantity of product in cart, item is deleted if nothing is left. Quantity None removes whole item.
+        """
+        if self.pk is None:
+            return False
+
+        return self.decrease_quantity(self.get_items(product, option), quantity)
+
+    def remove_item(self, item, quantity=1):
+        return self.decrease_quantity(Item.objects.filter(cart=self, pk=item.pk), quantity)
+
+    def decrease_quantity(self, items, quantity):
+        if quantity is None:
+            removed = items.delete()[0]
+        else:
+            removed = items.filter(quantity__gt=quantity).update(quantity=F('quantity') - quantity, modified=now()) or \
+                items.filter(quantity__lte=quantity).delete()[0]
+
+        if removed:
+            self.items_changed()
+
+        return bool(removed)
 
     def to_order(self, status):
+        from commerce.stock import order_reserves_stock, apply_stock_delta
+
         if not self.can_be_finished():
             return None
 
+        # price all items in one pass before any lock is taken
+        items = self.pricing.items
+        purchased_items = [PurchasedItem(
+            content_type=item.content_type,
+            object_id=item.object_id,
+            quantity=item.quantity,
+            price=item.price,
+            option=item.option
+        ) for item in items]
+
         # create order with cart data
-        order = Order.objects.create(
+        order = Order(
             user=self.user,
             status=status,
             delivery_name=self.delivery_name,
@@ -484,21 +598,26 @@ class Cart(models.Model, TaxationMixin):
             loyalty_points=self.loyalty_points
         )
 
-        for item in self.item_set.all():
-            PurchasedItem.objects.create(
-                order=order,
-                content_type=item.content_type,
-                object_id=item.object_id,
-                quantity=item.quantity,
-                price=item.price,
-                option=item.option
-            )
+        # freeze totals
+        order.calculate_totals(items_subtotal=self.items_subtotal)
+
+        with transaction.atomic():
+            order.save(force_insert=True)
+
+            for purchased_item in purchased_items:
+                purchased_item.order = order
+
+            # bulk_create does not send signals of purchased items
+            PurchasedItem.objects.bulk_create(purchased_items)
+
+            if order_reserves_stock(order.status):
+                for purchased_item in purchased_items:
+                    apply_stock_delta(purchased_item.content_type_id, purchased_item.object_id, purchased_item.option_id, purchased=purchased_item.quantity)
 
-        if order:
             # delete not useful cart anymore
             self.delete()
 
-        # call custom signal
+        # call custom signal (invoices are created in background)
         checkout_finished.send(sender=self.__class__, order=order)
 
         # return order
@@ -523,23 +642,11 @@ class Option(SlugMixin, models.Model):
         return self.title_i18n
 
     def total_supplies(self, product):
-        total_supplies = product.supplies.filter(
-            # product=product,  # AbstractModel
-            content_type=ContentType.objects.get_for_model(product),
-            object_id=product.id,
-            option=self).aggregate(sum=Sum('quantity'))['sum']
-        return total_supplies or 0
+        return product.option_stock_levels.get(self.id, {}).get('supplies', 0)
 
     def purchased(self, product):
         # count order items of not cancelled orders
-        purchased_items = PurchasedItem.objects.filter(
-            # product=self  # AbstractModel
-            content_type=ContentType.objects.get_for_model(product),
-            object_id=product.id,
-            option=self
-        ).of_not_cancelled_nor_refunded_orders()
-        quantity = purchased_items.aggregate(sum=Sum('quantity'))['sum']
-        return quantity or 0
+        return product.option_stock_levels.get(self.id, {}).get('purchased', 0)
 
     def in_stock(self, product):
         if product.availability == AbstractProduct.AVAILABILITY_INFINITE:
@@ -561,6 +668,10 @@ class Item(models.Model, TaxationMixin):
     class Meta:
         verbose_name = _('item')
         verbose_name_plural = _('items')
+        constraints = [
+            UniqueConstraint(fields=['cart', 'content_type', 'object_id', 'option'], name='unique_cart_item'),
+            UniqueConstraint(fields=['cart', 'content_type', 'object_id'], condition=Q(option=None), name='unique_cart_item_without_option'),
+        ]
 
     def __str__(self):
         return str(self.product)
@@ -577,15 +688,7 @@ class Item(models.Model, TaxationMixin):
 
     @property
     def price(self):
-        product = self.product
-        discount = self.cart.discount
-
-        if discount and discount.unit == Discount.UNIT_PERCENTAGE:
-            if Discount.objects.for_product(product).filter(id=discount.id).exists():
-                from commerce.templatetags.commerce import percentage_discount_price
-                return Decimal(percentage_discount_price(product.price, discount.amount))
-
-        return self.regular_price
+        return self.cart.pricing.get_price(self)
 
     def get_price_display(self):
         return f'{self.price} {commerce_settings.CURRENCY}'
@@ -682,6 +785,13 @@ class Order(models.Model, TaxationMixin):
     # Loyalty program
     loyalty_points = models.PositiveSmallIntegerField(_('loyalty points'), help_text=_('used to lower the total price'), blank=True, default=0)
 
+    # Totals (frozen at checkout, recalculated when purchased items change)
+    items_subtotal = models.DecimalField(_('items subtotal'), help_text=commerce_settings.CURRENCY, max_digits=10, decimal_places=2, blank=True, null=True, default=None)
+    credit = models.DecimalField(_('credit'), help_text=commerce_settings.CURRENCY, max_digits=10, decimal_places=2, blank=True, null=True, default=None)
+    tax = models.DecimalField(_('tax'), help_text=commerce_settings.CURRENCY, max_digits=10, decimal_places=2, blank=True, null=True, default=None)
+    total = models.DecimalField(_('total'), help_text=commerce_settings.CURRENCY, max_digits=10, decimal_places=2, db_index=True, blank=True, null=True, default=None)
+    total_in_cents = models.PositiveIntegerField(_('total in cents'), blank=True, null=True, default=None)
+
     # Timestamps
     reminder_sent = models.DateTimeField(_('reminder sent'), blank=True, null=True, default=None)
     created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
@@ -689,6 +799,8 @@ class Order(models.Model, TaxationMixin):
 
     objects = OrderQuerySet.as_manager()
 
+    TOTALS_FIELDS = ['items_subtotal', 'credit', 'tax', 'total', 'total_in_cents']
+
     class Meta:
         verbose_name = _('order')
         verbose_name_plural = _('orders')
@@ -727,9 +839,28 @@ class Order(models.Model, TaxationMixin):
     def render_payment_information(self):
         return self.payment_manager.render_payment_information()
 
+    @property
+    def earns_loyalty_points(self):
+        # the same statuses as OrderQuerySet.with_earned_loyalty_points()
+        return self.status not in [
+            self.STATUS_AWAITING_PAYMENT,
+            self.STATUS_CANCELLED,
+            self.STATUS_REFUNDED,
+            self.STATUS_PARTIALLY_REFUNDED,
+        ]
+
+    @property
+    def spends_loyalty_points(self):
+        # the same statuses as OrderQuerySet.with_spent_loyalty_points()
+        return self.status not in [
+            self.STATUS_CANCELLED,
+            self.STATUS_REFUNDED,
+            self.STATUS_PARTIALLY_REFUNDED,
+        ]
+
     @property
     def loyalty_points_earned(self):
-        if self not in self.user.order_set.with_earned_loyalty_points():
+        if not self.earns_loyalty_points:
             return 0
         return currency_units_to_points(self.total)
 
@@ -742,41 +873,75 @@ class Order(models.Model, TaxationMixin):
 
     @property
     def subtotal(self):
-        subtotal = sum([item.subtotal for item in self.purchaseditem_set.all()])
+        # totals of unsaved order are not calculated yet
+        return max((self.items_subtotal or 0) - (self.credit or 0), 0)
+
+    @property
+    def vat(self):
+        return self.tax
+
+    def calculate_totals(self, items_subtotal=None):
+        if items_subtotal is None:
+            items_subtotal = sum([item.subtotal for item in self.purchaseditem_set.all()]) if self.pk else 0
+
+        # loyalty program
+        credit = points_to_currency_unit(self.loyalty_points_used)
 
         # discount
         if self.discount and self.discount.unit == Discount.UNIT_CURRENCY:
-            subtotal -= self.discount.amount
+            credit += self.discount.amount
 
-        # loyalty program
-        subtotal -= points_to_currency_unit(self.loyalty_points_used)
+        self.items_subtotal = items_subtotal
+        self.credit = credit
+        self.total, self.tax = self.compute_tax_breakdown(self.subtotal)
+        self.total_in_cents = int(self.total * 100)
 
-        return max(subtotal, 0)
+    def update_totals(self):
+        self.calculate_totals()
 
-    @property
-    def total_in_cents(self):
-        return int(self.total * 100)
+        # without signals of save()
+        Order.objects.filter(pk=self.pk).update(**{field: getattr(self, field) for field in self.TOTALS_FIELDS})
+
+        if commerce_settings.LOYALTY_PROGRAM_ENABLED:
+            sync_order_loyalty_points(self)
+
+    def get_purchased_items_with_products(self):
+        if 'purchaseditem_set' in getattr(self, '_prefetched_objects_cache', {}):
+            return self.purchaseditem_set.all()
+
+        # products are loaded in one query per content type
+        return self.purchaseditem_set.all().select_related('option').prefetch_related('product')
 
     @staticmethod
-    def get_next_number():
-        with transaction.atomic():
-            Order.objects.lock()
+    def create_invoices(orders, **kwargs):
+        """
+        Creates invoice of every order, purchased items and their products are loaded at once
+        """
+        orders = orders.select_related('user', 'payment_method', 'discount').prefetch_related(
+            models.Prefetch('purchaseditem_set', queryset=PurchasedItem.objects.select_related('option').prefetch_related('product'))
+        )
 
-            last_order = Order.objects.all().order_by('number').last()
+        return [order.create_invoice(**kwargs) for order in orders]
 
-            next_number = last_order.number + 1 if last_order else int(commerce_settings.ORDER_NUMBER_STARTS_FROM)
+    @staticmethod
+    def get_next_number():
+        allocator = get_order_number_allocator()
+        next_number = allocator.get_next_number()
 
-            # order number has to be unique
-            while Order.objects.filter(number=next_number).exists():
-                next_number += 1
+        # order number has to be unique (it could be set manually)
+        while Order.objects.filter(number=next_number).exists():
+            next_number = allocator.get_next_number()
 
-            return next_number
+        return next_number
 
     @transaction.atomic
     def save(self, *args, **kwargs):
         if self.number in EMPTY_VALUES:
             self.number = Order.get_next_number()
 
+        if self.total is None:
+            self.calculate_totals()
+
         return super().save(*args, **kwargs)
 
     def has_item_of_type(self, model):
@@ -798,6 +963,7 @@ class Order(models.Model, TaxationMixin):
     def delivery_details_required(self):
         return not self.has_only_digital_goods()
 
+    @transaction.atomic
     def create_invoice(self, type=Invoice.TYPE.INVOICE, status=Invoice.STATUS.SENT, creator=None, sequence_generator=None, number_formatter=None):
         language = getattr(self.user, 'preferred_language', settings.LANGUAGE_CODE) or settings.LANGUAGE_CODE  # TODO: user is Abstract model. preferred_language could be missing or should be configurable
 
@@ -879,34 +1045,30 @@ class Order(models.Model, TaxationMixin):
 
             tax_rate = invoice.get_tax_rate()
 
-            for purchaseditem in self.purchaseditem_set.all():
-                item = InvoiceItem.objects.create(
-                    invoice=invoice,
-                    title=purchaseditem.title_with_option,
-                    quantity=purchaseditem.quantity,
-                    unit=InvoiceItem.UNIT_PIECES,
-                    unit_price=check_tax_and_get_price(purchaseditem.price, tax_rate),
-                    tax_rate=tax_rate
-                    # discount=self.discount,  # TODO
-                )
-
-            # calculate credit (it's important to add it after items and invoice creation)
+            # items are built in memory and created at once (without signals recalculating invoice after each item)
+            items = [InvoiceItem(
+                invoice=invoice,
+                title=purchaseditem.title_with_option,
+                quantity=purchaseditem.quantity,
+                unit=InvoiceItem.UNIT_PIECES,
+                unit_price=check_tax_and_get_price(purchaseditem.price, tax_rate),
+                tax_rate=tax_rate
+                # discount=self.discount,  # TODO
+            ) for purchaseditem in self.get_purchased_items_with_products()]
+
+            # calculate credit (from purchased items only, before fees are added)
             credit = points_to_currency_unit(self.loyalty_points_used)
 
             if self.discount and self.discount.unit == Discount.UNIT_CURRENCY:
                 credit += self.discount.amount
 
             # credit can't be more ten sum of items
-            credit = min(credit, invoice.subtotal)
-
-            # update invoice credit
-            invoice.credit = credit
-            invoice.save(update_fields=['credit'])
+            credit = min(credit, round(sum([item.subtotal for item in items]), 2))
 
             shipping_fee = check_tax_and_get_price(self.shipping_fee, tax_rate)
 
             if shipping_fee > 0 and not commerce_settings.EXCLUDE_FREE_ITEMS_FROM_INVOICE:
-                shipping_item = InvoiceItem.objects.create(
+                items.append(InvoiceItem(
                     invoice=invoice,
                     title=_('Shipping fee'),
                     quantity=1,
@@ -914,12 +1076,12 @@ class Order(models.Model, TaxationMixin):
                     unit_price=shipping_fee,
                     tax_rate=tax_rate
                     # discount=self.discount,  # TODO
-                )
+                ))
 
             payment_fee = check_tax_and_get_price(self.payment_fee, tax_rate)
 
             if payment_fee > 0 and not commerce_settings.EXCLUDE_FREE_ITEMS_FROM_INVOICE:
-                payment_item = InvoiceItem.objects.create(
+                items.append(InvoiceItem(
                     invoice=invoice,
                     title=_('Payment fee'),
                     quantity=1,
@@ -927,7 +1089,17 @@ class Order(models.Model, TaxationMixin):
                     unit_price=payment_fee,
                     tax_rate=tax_rate
                     # discount=self.discount,  # TODO
-                )
+                ))
+
+            # supplier VAT ID is required for taxed items (see InvoiceItem.save)
+            if tax_rate not in EMPTY_VALUES and invoice.supplier_vat_id in EMPTY_VALUES:
+                raise ValueError(f'Tax rate is {tax_rate}% but supplier VAT ID is not set. Invoice #{invoice.pk}, number {invoice.number}')
+
+            InvoiceItem.objects.bulk_create(items)
+
+            # update invoice credit (total and VAT are recalculated from items on save)
+            invoice.credit = credit
+            invoice.save(update_fields=['credit', 'total', 'vat'])
 
             self.invoices.add(invoice)
 
@@ -993,6 +1165,91 @@ class Order(models.Model, TaxationMixin):
         self.save(update_fields=['reminder_sent'])
 
 
+class LoyaltyTransaction(models.Model):
+    TYPE_EARN = 'EARN'
+    TYPE_SPEND = 'SPEND'
+    TYPE_EXPIRE = 'EXPIRE'
+    TYPE_REVERSAL = 'REVERSAL'
+    TYPES = [
+        (TYPE_EARN, _('earn')),
+        (TYPE_SPEND, _('spend')),
+        (TYPE_EXPIRE, _('expire')),
+        (TYPE_REVERSAL, _('reversal')),
+    ]
+    user = models.ForeignKey(get_user_model(), verbose_name=_('user'), on_delete=models.CASCADE)
+    order = models.ForeignKey('commerce.Order', verbose_name=_('order'), on_delete=models.SET_NULL, blank=True, null=True, default=None)
+    type = models.CharField(_('type'), choices=TYPES, max_length=8, db_index=True)
+    points = models.IntegerField(_('points'), help_text=_('negative value lowers the balance'))
+    created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('loyalty transaction')
+        verbose_name_plural = _('loyalty transactions')
+        ordering = ('created',)
+
+    def __str__(self):
+        return f'{self.user}: {self.points}'
+
+
+class BankTransaction(models.Model):
+    RESULT_PAID = 'PAID'
+    RESULT_PARTIAL = 'PARTIAL'
+    RESULT_OVERPAID = 'OVERPAID'
+    RESULT_MISMATCH = 'MISMATCH'
+    RESULT_SUGGESTED = 'SUGGESTED'
+    RESULT_AMBIGUOUS = 'AMBIGUOUS'
+    RESULT_NOT_MATCHED = 'NOT_MATCHED'
+    RESULTS = [
+        (RESULT_PAID, _('paid')),
+        (RESULT_PARTIAL, _('partial payment')),
+        (RESULT_OVERPAID, _('overpaid')),
+        (RESULT_MISMATCH, _('mismatch')),
+        (RESULT_SUGGESTED, _('suggested by amount')),
+        (RESULT_AMBIGUOUS, _('ambiguous')),
+        (RESULT_NOT_MATCHED, _('not matched')),
+    ]
+    bank = models.CharField(_('bank'), max_length=16)
+    transaction_id = models.CharField(_('transaction ID'), max_length=64)
+    date = models.DateField(_('date'), blank=True, null=True, default=None)
+    value = models.DecimalField(_('value'), max_digits=12, decimal_places=2)
+    currency = models.CharField(_('currency'), max_length=3, blank=True)
+    variable_symbol = models.CharField(_('variable symbol'), max_length=20, blank=True, db_index=True)
+    sender = models.CharField(_('sender'), max_length=255, blank=True)
+    sender_account = models.CharField(_('sender account'), max_length=64, blank=True)
+    sender_bank = models.CharField(_('sender bank'), max_length=255, blank=True)
+    information = models.TextField(_('information'), blank=True)
+    type = models.CharField(_('type'), max_length=100, blank=True)
+    issued_by = models.CharField(_('issued by'), max_length=100, blank=True)
+    order = models.ForeignKey(Order, verbose_name=_('order'), on_delete=models.SET_NULL, blank=True, null=True, default=None)
+    result = models.CharField(_('result'), choices=RESULTS, max_length=11, db_index=True)
+    errors = models.TextField(_('errors'), blank=True)
+    created = models.DateTimeField(_('created'), auto_now_add=True, db_index=True)
+
+    class Meta:
+        verbose_name = _('bank transaction')
+        verbose_name_plural = _('bank transactions')
+        ordering = ('-id',)
+        constraints = [
+            UniqueConstraint(fields=['bank', 'transaction_id'], name='unique_bank_transaction'),
+        ]
+
+    def __str__(self):
+        return f'{self.bank} {self.transaction_id}: {self.value} {self.currency}'
+
+
+class NumberCounter(models.Model):
+    # used by commerce.numbering.CounterOrderNumberAllocator
+    name = models.CharField(_('name'), max_length=30, unique=True)
+    last_number = models.PositiveIntegerField(_('last number'))
+
+    class Meta:
+        verbose_name = _('number counter')
+        verbose_name_plural = _('number counters')
+
+    def __str__(self):
+        return f'{self.name}: {self.last_number}'
+
+
 class PurchasedItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE)
     content_type = models.ForeignKey(ContentType, on_delete=models.PROTECT)
@@ -1071,4 +1328,31 @@ class Supply(models.Model):
         return f'{self.real_product}: {self.quantity} [{self.datetime}]'
 
 
+class StockLevel(models.Model):
+    # materialised sums of supplies and purchased items (maintained by commerce.stock)
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    product = GenericForeignKey('content_type', 'object_id')
+    option = models.ForeignKey(Option, on_delete=models.CASCADE, blank=True, null=True, default=None)
+    supplies = models.IntegerField(_('supplies'), default=0)
+    purchased = models.IntegerField(_('purchased'), default=0)
+    modified = models.DateTimeField(_('modified'), auto_now=True)
+    objects = StockLevelQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = _('stock level')
+        verbose_name_plural = _('stock levels')
+        constraints = [
+            UniqueConstraint(fields=['content_type', 'object_id', 'option'], name='unique_stock_level'),
+            UniqueConstraint(fields=['content_type', 'object_id'], condition=Q(option=None), name='unique_stock_level_without_option'),
+        ]
+
+    def __str__(self):
+        return f'{self.content_type_id}:{self.object_id} ({self.option_id}): {self.in_stock}'
+
+    @property
+    def in_stock(self):
+        return self.supplies - self.purchased
+
+
 from .signals import *
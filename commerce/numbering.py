@@ -0,0 +1,169 @@
+import os
+import threading
+from functools import lru_cache
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Max
+from django.utils.module_loading import import_string
+
+from commerce import settings as commerce_settings
+
+
+class OrderNumberAllocator(object):
+    def get_next_number(self):
+        raise NotImplementedError()
+
+    def get_first_number(self):
+        from commerce.models import Order
+        last_number = Order.objects.aggregate(max=Max('number'))['max']
+        return last_number + 1 if last_number else int(commerce_settings.ORDER_NUMBER_STARTS_FROM)
+
+
+class CounterOrderNumberAllocator(OrderNumberAllocator):
+    """
+    Gapless numbers from a counter row locked by SELECT ... FOR UPDATE.
+
+    Unlike locking the whole order table, reads of orders are not blocked. The counter row stays locked
+    until the surrounding transaction (order insert) is committed, so numbers of rolled back orders are reused.
+    """
+    counter_name = 'order'
+
+    def get_next_number(self):
+        from commerce.models import NumberCounter
+
+        with transaction.atomic():
+            try:
+                counter = NumberCounter.objects.select_for_update().get(name=self.counter_name)
+            except NumberCounter.DoesNotExist:
+                counter = self.create_counter()
+
+            counter.last_number += 1
+            counter.save(update_fields=['last_number'])
+            return counter.last_number
+
+    def create_counter(self):
+        from commerce.models import NumberCounter
+
+        try:
+            # inserted row stays locked until the end of transaction
+            with transaction.atomic():
+                return NumberCounter.objects.create(name=self.counter_name, last_number=self.get_first_number() - 1)
+        except IntegrityError:
+            # created by concurrent transaction meanwhile
+            return NumberCounter.objects.select_for_update().get(name=self.counter_name)
+
+
+class SequenceOrderNumberAllocator(OrderNumberAllocator):
+    """
+    Numbers from a dedicated PostgreSQL sequence (created by migration), without any locks. The sequence
+    is seeded by settings and existing orders on the first allocation.
+
+    Numbers of rolled back orders are not reused. With block size greater than 1, every process reserves
+    a whole range of numbers at once (sequence increments by block size) and hands them out from memory,
+    so numbers are unique but not ordered by creation time across processes.
+
+    Increment of the sequence has to match the block size: after changing it (or switching from another
+    allocator once the sequence was used) run the align_order_number_sequence command.
+    """
+    sequence_name = 'commerce_order_number'
+
+    def __init__(self, block_size=None):
+        self.block_size = int(block_size or commerce_settings.ORDER_NUMBER_BLOCK_SIZE)
+        self.lock = threading.Lock()
+        self.sequence_checked = False
+        self.block = None  # (process ID, next number, end of block)
+
+    def get_sequence(self):
+        """
+        Returns increment of the sequence, the first number of the next block and whether any number was taken
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT increment_by FROM pg_sequences WHERE schemaname = current_schema() AND sequencename = %s',
+                [self.sequence_name]
+            )
+            row = cursor.fetchone()
+
+            if row is None:
+                raise ImproperlyConfigured(f'Sequence {self.sequence_name} does not exist, run migrations')
+
+            cursor.execute(f'SELECT last_value, is_called FROM {self.sequence_name}')
+            last_value, is_called = cursor.fetchone()
+
+        increment = row[0]
+        return increment, last_value + increment if is_called else last_value, is_called
+
+    def matches_sequence(self, increment, next_number):
+        return increment == self.block_size and next_number >= self.get_first_number()
+
+    def check_sequence(self):
+        if self.sequence_checked:
+            return
+
+        increment, next_number, used = self.get_sequence()
+
+        if not self.matches_sequence(increment, next_number):
+            if used:
+                raise ImproperlyConfigured(
+                    f'Sequence {self.sequence_name} (increment {increment}, next number {next_number}) does not match '
+                    f'block size {self.block_size} or existing orders, run align_order_number_sequence command'
+                )
+
+            self.seed_sequence()
+
+        self.sequence_checked = True
+
+    def seed_sequence(self):
+        """
+        Aligns the sequence created by migration (no number was taken yet) with block size and existing orders
+        """
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                # concurrent processes seed the sequence one by one
+                cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [self.sequence_name])
+
+            increment, next_number, used = self.get_sequence()
+
+            if not used and not self.matches_sequence(increment, next_number):
+                self.align_sequence()
+
+    def align_sequence(self):
+        """
+        Sets increment of the sequence to the block size, blocks reserved by running processes are skipped
+        """
+        increment, next_number, used = self.get_sequence()
+        restart = max(next_number, self.get_first_number())
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'ALTER SEQUENCE {self.sequence_name} INCREMENT BY {int(self.block_size)} RESTART WITH {int(restart)}')
+
+        self.sequence_checked = False
+        self.block = None
+        return restart
+
+    def reserve_block(self):
+        self.check_sequence()
+
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT nextval(%s)', [self.sequence_name])
+            first_number = cursor.fetchone()[0]
+
+        return first_number, first_number + self.block_size
+
+    def get_next_number(self):
+        with self.lock:
+            pid = os.getpid()
+
+            # forked processes can't share reserved block
+            if self.block is None or self.block[0] != pid or self.block[1] >= self.block[2]:
+                self.block = (pid, *self.reserve_block())
+
+            pid, next_number, end = self.block
+            self.block = (pid, next_number + 1, end)
+            return next_number
+
+
+@lru_cache(maxsize=None)
+def get_order_number_allocator():
+    return import_string(commerce_settings.ORDER_NUMBER_ALLOCATOR)()
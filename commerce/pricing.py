@@ -0,0 +1,114 @@
+from decimal import Decimal
+
+from django.contrib.contenttypes.models import ContentType
+from django.utils.functional import cached_property
+
+from commerce.discounts import get_discount_index
+from commerce.loyalty import points_to_currency_unit
+from commerce.models import Discount
+
+
+class CartPricing(object):
+    """
+    Snapshot of cart prices.
+
+    Items, their products (grouped by content type) and cart discount eligibility are loaded in bulk,
+    so the cost of pricing a cart does not grow with the number of its items.
+    """
+    def __init__(self, cart):
+        self.cart = cart
+
+    @cached_property
+    def items(self):
+        if self.cart.pk is None:
+            # cart is not saved until the first item is added
+            return []
+
+        if 'item_set' in getattr(self.cart, '_prefetched_objects_cache', {}):
+            # loaded by CartQuerySet.with_pricing_items()
+            items = list(self.cart.item_set.all())
+        else:
+            items = list(self.cart.item_set.all()
+                         .select_related('content_type', 'option')
+                         .prefetch_related('product')
+                         .order_by('created', 'id'))
+
+        # share this snapshot with all items
+        for item in items:
+            item.cart = self.cart
+
+        return items
+
+    @cached_property
+    def percentage_discount(self):
+        discount = self.cart.discount
+
+        if discount and discount.unit == Discount.UNIT_PERCENTAGE:
+            return discount
+
+        return None
+
+    @cached_property
+    def discount_index(self):
+        return get_discount_index()
+
+    def is_discounted(self, item):
+        if self.percentage_discount is None:
+            return False
+
+        return self.percentage_discount.id in self.discount_index.get_discount_ids(item.content_type_id, item.object_id)
+
+    def get_price(self, item):
+        if self.is_discounted(item):
+            from commerce.templatetags.commerce import percentage_discount_price
+            return Decimal(percentage_discount_price(item.regular_price, self.percentage_discount.amount))
+
+        return item.regular_price
+
+    @cached_property
+    def items_subtotal(self):
+        return sum([item.quantity * self.get_price(item) for item in self.items])
+
+    @cached_property
+    def items_quantity(self):
+        return sum([item.quantity for item in self.items])
+
+    @cached_property
+    def subtotal(self):
+        subtotal = self.items_subtotal
+        discount = self.cart.discount
+
+        # discount
+        if discount and discount.unit == Discount.UNIT_CURRENCY:
+            subtotal -= discount.amount
+
+        # loyalty program
+        subtotal -= points_to_currency_unit(self.cart.loyalty_points_used)
+
+        return max(subtotal, 0)
+
+    @cached_property
+    def tax_breakdown(self):
+        return self.cart.compute_tax_breakdown(self.subtotal)
+
+    @property
+    def total(self):
+        return self.tax_breakdown[0]
+
+    @property
+    def vat(self):
+        return self.tax_breakdown[1]
+
+    def has_item(self, products, option=None):
+        keys = {(ContentType.objects.get_for_model(product).id, product.id) for product in products}
+
+        for item in self.items:
+            if (item.content_type_id, item.object_id) not in keys:
+                continue
+
+            if option and item.option_id != option.id:
+                continue
+
+            return True
+
+        return False
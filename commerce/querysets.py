@@ -1,10 +1,10 @@
 from datetime import timedelta
 
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
+from django.db.models import Q, Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.timezone import now
-from gm2m.models import create_gm2m_intermediary_model
 from commerce import settings as commerce_settings
 
 
@@ -13,8 +13,54 @@ class CartQuerySet(models.QuerySet):
         threshold = now() - timedelta(days=days)
         return self.filter(created__lte=threshold)
 
+    def inactive(self, days):
+        threshold = now() - timedelta(days=days)
+        return self.filter(last_activity__lte=threshold)
+
     def empty(self):
-        return self.filter(item__isnull=True)
+        # NOT EXISTS instead of LEFT JOIN over all items
+        return self.exclude(models.Exists(self._items()))
+
+    def not_empty(self):
+        return self.filter(models.Exists(self._items()))
+
+    def _items(self):
+        from commerce.models import Item
+        return Item.objects.filter(cart=OuterRef('pk'))
+
+    def not_reminded(self):
+        return self.filter(abandoned_reminder_sent=None)
+
+    def abandoned(self, days=None):
+        """ Not empty carts without activity for given number of days """
+        days = commerce_settings.ABANDONED_CART_THRESHOLD if days is None else days
+        return self.inactive(days).not_empty()
+
+    def delete_in_batches(self, batch_size=None):
+        """
+        Deletes carts (and their items) in batches, every batch in its own short transaction
+        """
+        batch_size = batch_size or commerce_settings.CART_DELETE_BATCH_SIZE
+        total = 0
+
+        while True:
+            cart_ids = list(self.order_by('id').values_list('id', flat=True)[:batch_size])
+
+            if not cart_ids:
+                return total
+
+            with transaction.atomic():
+                # predicates of the queryset are checked again (e.g. cart got an item meanwhile)
+                self.filter(id__in=cart_ids).delete()
+
+            total += len(cart_ids)
+
+    def with_pricing_items(self):
+        # everything needed by cart pricing, in the order of CartPricing.items
+        from commerce.models import Item
+        items = Item.objects.select_related('content_type', 'option').prefetch_related('product').order_by('created', 'id')
+        return self.select_related('discount', 'shipping_option', 'payment_method')\
+            .prefetch_related(models.Prefetch('item_set', queryset=items))
 
 
 class OrderQuerySet(models.QuerySet):
@@ -50,6 +96,10 @@ class OrderQuerySet(models.QuerySet):
     def not_reminded(self):
         return self.filter(reminder_sent=None)
 
+    def with_totals(self):
+        """ Orders with stored totals only, without loading their purchased items """
+        return self.prefetch_related(None).only('id', 'number', 'status', 'user', 'created', *self.model.TOTALS_FIELDS)
+
     def old(self, days=None, interval='open'):
         if days is None:
             return self.none()
@@ -116,43 +166,78 @@ class DiscountCodeQuerySet(models.QuerySet):
         return self.filter(content_types__in=content_types)
 
     def for_product(self, product):
+        from commerce.discounts import get_discount_index
         ct = ContentType.objects.get_for_model(product.__class__)
+        return self.filter(id__in=get_discount_index().get_discount_ids(ct.id, product.pk))
 
-        try:
-            product_discounts = product.discounts.all()
-        except AttributeError:
-            product_discounts = self.none()
-
-        field = getattr(self.model, 'products').field
-        im = create_gm2m_intermediary_model(field, self.model)
-        ids_of_discounts_with_products = set(im.objects.values_list('gm2m_src_id', flat=True))
-
-        # Q(unit=self.model.UNIT_PERCENTAGE),
-        return self.filter(
-            Q(id__in=product_discounts) |  # specific product discounts
-            Q(
-                ~Q(id__in=ids_of_discounts_with_products),  # exclude discounts of specific products
-                Q(
-                    Q(content_types__in=[ct]) |  # content type discounts
-                    Q(content_types=None)        # or general discounts
-                )
-            )
-        )
+    def for_products(self, products):
+        """
+        Returns applicable discounts of every product: {product: [discount, ...]}
+        """
+        from commerce.discounts import get_discount_index
+        index = get_discount_index()
+        discount_ids_of_products = {}
+
+        for product in products:
+            ct = ContentType.objects.get_for_model(product.__class__)
+            discount_ids_of_products[product] = index.get_discount_ids(ct.id, product.pk)
+
+        discount_ids = set().union(*discount_ids_of_products.values())
+        discounts = list(self.filter(id__in=discount_ids)) if discount_ids else []
+
+        return {
+            product: [discount for discount in discounts if discount.id in ids]
+            for product, ids in discount_ids_of_products.items()
+        }
 
 
 class ShippingOptionQuerySet(models.QuerySet):
     def for_country(self, country):
+        # country specific shipping options or shipping options for all countries (general) if there are none
         country_shipping_options = self.filter(countries__contains=[country])
-
-        if country_shipping_options.exists():
-            # country specific shipping options
-            return country_shipping_options
-
-        # shipping options for all countries (general)
-        return self.filter(countries=[])
+        return self.filter(Q(countries__contains=[country]) | Q(countries=[]) & ~models.Exists(country_shipping_options))
 
     def free(self):
         return self.filter(fee=0)
 
     def not_free(self):
         return self.exclude(fee=0)
+
+
+class StockLevelQuerySet(models.QuerySet):
+    def for_product(self, product, option=None):
+        queryset = self.filter(
+            content_type=ContentType.objects.get_for_model(product),
+            object_id=product.id
+        )
+
+        if option:
+            queryset = queryset.filter(option=option)
+
+        return queryset
+
+    def totals(self):
+        return self.aggregate(
+            supplies=Coalesce(Sum('supplies'), 0),
+            purchased=Coalesce(Sum('purchased'), 0)
+        )
+
+    def totals_by_option(self):
+        return {
+            level['option']: {'supplies': level['supplies'], 'purchased': level['purchased']}
+            for level in self.values('option').annotate(supplies=Sum('supplies'), purchased=Sum('purchased')).order_by()
+        }
+
+    def annotate_products(self, queryset):
+        """
+        Annotates product queryset with stock_supplies and stock_purchased used by AbstractProduct.in_stock
+        """
+        levels = self.filter(
+            content_type=ContentType.objects.get_for_model(queryset.model),
+            object_id=OuterRef('pk')
+        ).order_by().values('object_id')
+
+        return queryset.annotate(
+            stock_supplies=Coalesce(Subquery(levels.annotate(sum=Sum('supplies')).values('sum')), 0),
+            stock_purchased=Coalesce(Subquery(levels.annotate(sum=Sum('purchased')).values('sum')), 0),
+        )
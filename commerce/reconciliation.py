@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+from django.core.validators import EMPTY_VALUES
+from django.db.models import Sum, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from commerce import settings as commerce_settings
+
+
+class OpenOrder(object):
+    __slots__ = ['id', 'number', 'total', 'paid']
+
+    def __init__(self, id, number, total, paid):
+        self.id = id
+        self.number = number
+        self.total = total
+        self.paid = paid
+
+    @property
+    def remaining(self):
+        return self.total - self.paid
+
+
+class OpenOrderIndex(object):
+    """
+    Orders awaiting payment indexed by variable symbol (order number) and by remaining amount
+    """
+    def __init__(self, orders):
+        self.by_variable_symbol = {}
+        self.by_amount = {}
+
+        for order in orders:
+            self.by_variable_symbol[str(order.number)] = order
+            self.by_amount.setdefault(order.remaining, []).append(order)
+
+    @classmethod
+    def build(cls):
+        from commerce.models import BankTransaction, Order
+
+        # partial payments received so far
+        paid = BankTransaction.objects\
+            .filter(order=OuterRef('pk'), result=BankTransaction.RESULT_PARTIAL)\
+            .order_by()\
+            .values('order')\
+            .annotate(paid=Sum('value'))\
+            .values('paid')
+
+        orders = Order.objects\
+            .awaiting_payment()\
+            .annotate(paid=Coalesce(Subquery(paid), Decimal(0)))\
+            .values_list('id', 'number', 'total', 'paid')
+
+        return cls([OpenOrder(*values) for values in orders.iterator(chunk_size=2000)])
+
+    def add_payment(self, order, value):
+        self.remove_amount(order)
+        order.paid += value
+
+        if order.remaining > 0:
+            self.by_amount.setdefault(order.remaining, []).append(order)
+
+    def remove(self, order):
+        self.remove_amount(order)
+        self.by_variable_symbol.pop(str(order.number), None)
+
+    def remove_amount(self, order):
+        orders = self.by_amount.get(order.remaining, [])
+
+        if order in orders:
+            orders.remove(order)
+
+
+class Match(object):
+    def __init__(self, transaction, result, order=None, errors=''):
+        self.transaction = transaction
+        self.result = result
+        self.order = order
+        self.errors = errors
+
+    @property
+    def order_id(self):
+        return self.order.id if self.order else None
+
+
+def normalize_variable_symbol(variable_symbol):
+    if variable_symbol in EMPTY_VALUES:
+        return None
+
+    variable_symbol = str(variable_symbol).strip().lstrip('0')
+    return variable_symbol if variable_symbol.isdigit() else None
+
+
+def reconcile(transactions, index):
+    """
+    Matches normalised bank transactions (see banks.BankAdapter) against open orders.
+
+    Orders are paid by transactions with their variable symbol only. Transactions without variable symbol
+    are matched by amount as suggestions, or flagged as ambiguous. Index is updated by paid amounts,
+    so following transactions (also of following batches) see them.
+    """
+    from commerce.models import BankTransaction
+
+    matches = []
+
+    for transaction in transactions:
+        value = transaction['value']
+
+        # outgoing payments
+        if value is None or value <= 0:
+            matches.append(Match(transaction, BankTransaction.RESULT_NOT_MATCHED, errors='Not incoming payment'))
+            continue
+
+        variable_symbol = normalize_variable_symbol(transaction['variable_symbol'])
+
+        if variable_symbol is None:
+            candidates = index.by_amount.get(value, [])
+
+            if len(candidates) == 1:
+                matches.append(Match(transaction, BankTransaction.RESULT_SUGGESTED, candidates[0], 'Missing variable symbol, matched by amount'))
+            elif candidates:
+                numbers = ', '.join(sorted(str(order.number) for order in candidates))
+                matches.append(Match(transaction, BankTransaction.RESULT_AMBIGUOUS, errors=f'Missing variable symbol, amount matches orders {numbers}'))
+            else:
+                matches.append(Match(transaction, BankTransaction.RESULT_NOT_MATCHED, errors='Missing variable symbol'))
+
+            continue
+
+        order = index.by_variable_symbol.get(variable_symbol)
+
+        if order is None:
+            matches.append(Match(transaction, BankTransaction.RESULT_NOT_MATCHED, errors='Order awaiting payment not found'))
+            continue
+
+        if transaction['currency'] != commerce_settings.CURRENCY:
+            matches.append(Match(transaction, BankTransaction.RESULT_MISMATCH, order, 'Currency mismatch'))
+            continue
+
+        remaining = order.remaining
+
+        if value < remaining:
+            index.add_payment(order, value)
+            matches.append(Match(transaction, BankTransaction.RESULT_PARTIAL, order, f'Partial payment, {order.remaining} remaining'))
+        elif value == remaining:
+            index.remove(order)
+            matches.append(Match(transaction, BankTransaction.RESULT_PAID, order))
+        else:
+            index.remove(order)
+            matches.append(Match(transaction, BankTransaction.RESULT_OVERPAID, order, f'Overpaid by {value - remaining}'))
+
+    return matches
+
+
+def get_paid_order_ids(matches):
+    from commerce.models import BankTransaction
+    return {match.order_id for match in matches if match.result in [BankTransaction.RESULT_PAID, BankTransaction.RESULT_OVERPAID]}
@@ -19,8 +19,12 @@ RECIPIENT_ADDRESS = getattr(settings, 'COMMERCE_RECIPIENT_ADDRESS', '')
 USE_RQ = getattr(settings, 'COMMERCE_USE_RQ', True)
 REDIS_QUEUE = getattr(settings, 'COMMERCE_REDIS_QUEUE', 'default')
 ORDER_NUMBER_STARTS_FROM = getattr(settings, 'COMMERCE_ORDER_NUMBER_STARTS_FROM', 1)
+ORDER_NUMBER_ALLOCATOR = getattr(settings, 'COMMERCE_ORDER_NUMBER_ALLOCATOR', 'commerce.numbering.CounterOrderNumberAllocator')
+ORDER_NUMBER_BLOCK_SIZE = getattr(settings, 'COMMERCE_ORDER_NUMBER_BLOCK_SIZE', 1)  # used by SequenceOrderNumberAllocator
 OLD_ORDER_REMIND_THRESHOLD = getattr(settings, 'COMMERCE_OLD_ORDER_REMIND_THRESHOLD', 7)  # in days
+ORDER_REMINDERS_CHUNK_SIZE = getattr(settings, 'COMMERCE_ORDER_REMINDERS_CHUNK_SIZE', 100)
 OLD_ORDER_CANCEL_THRESHOLD = getattr(settings, 'COMMERCE_OLD_ORDER_CANCEL_THRESHOLD', 14)  # in days
+CANCEL_UNPAID_ORDERS_BATCH_SIZE = getattr(settings, 'COMMERCE_CANCEL_UNPAID_ORDERS_BATCH_SIZE', 500)
 NOTIFY_ABOUT_STATUSES = getattr(settings, 'COMMERCE_NOTIFY_ABOUT_STATUSES', [
     'STATUS_AWAITING_PAYMENT', 'STATUS_PENDING', 'STATUS_PAYMENT_RECEIVED', 'STATUS_PROCESSING',
     'STATUS_AWAITING_FULFILLMENT', 'STATUS_AWAITING_SHIPMENT', 'STATUS_AWAITING_PICKUP',
@@ -28,21 +32,44 @@ NOTIFY_ABOUT_STATUSES = getattr(settings, 'COMMERCE_NOTIFY_ABOUT_STATUSES', [
     'STATUS_REFUNDED', 'STATUS_PARTIALLY_REFUNDED', 'STATUS_DISPUTED', 'STATUS_ON_HOLD'])
 CREATE_PROFORMA_INVOICE = getattr(settings, 'COMMERCE_CREATE_PROFORMA_INVOICE', False)
 EXCLUDE_FREE_ITEMS_FROM_INVOICE = getattr(settings, 'COMMERCE_EXCLUDE_FREE_ITEMS_FROM_INVOICE', False)
+EMPTY_CART_DELETE_THRESHOLD = getattr(settings, 'COMMERCE_EMPTY_CART_DELETE_THRESHOLD', 1)  # in days
+ABANDONED_CART_THRESHOLD = getattr(settings, 'COMMERCE_ABANDONED_CART_THRESHOLD', 1)  # in days without activity
+ABANDONED_CART_DELETE_THRESHOLD = getattr(settings, 'COMMERCE_ABANDONED_CART_DELETE_THRESHOLD', 90)  # in days without activity, None to keep carts
+ABANDONED_CART_REMINDERS_ENABLED = getattr(settings, 'COMMERCE_ABANDONED_CART_REMINDERS_ENABLED', False)
+ABANDONED_CART_REMINDERS_PER_RUN = getattr(settings, 'COMMERCE_ABANDONED_CART_REMINDERS_PER_RUN', 1000)  # rate limit
+ABANDONED_CART_REMINDERS_CHUNK_SIZE = getattr(settings, 'COMMERCE_ABANDONED_CART_REMINDERS_CHUNK_SIZE', 100)
+ABANDONED_CART_REMINDERS_CHUNK_DELAY = getattr(settings, 'COMMERCE_ABANDONED_CART_REMINDERS_CHUNK_DELAY', 0)  # in seconds between chunks
+CART_DELETE_BATCH_SIZE = getattr(settings, 'COMMERCE_CART_DELETE_BATCH_SIZE', 500)
 LOYALTY_PROGRAM_ENABLED = getattr(settings, 'COMMERCE_LOYALTY_PROGRAM_ENABLED', False)
+LOYALTY_REMINDERS_CHUNK_SIZE = getattr(settings, 'COMMERCE_LOYALTY_REMINDERS_CHUNK_SIZE', 100)
 LOYALTY_POINTS_PER_CURRENCY_UNIT = getattr(settings, 'COMMERCE_LOYALTY_POINTS_PER_CURRENCY_UNIT', 0)
 CURRENCY_UNITS_PER_LOYALTY_POINT = getattr(settings, 'COMMERCE_CURRENCY_UNITS_PER_LOYALTY_POINT', 0)
 UNIT_PRICE_IS_WITH_TAX = getattr(settings, 'COMMERCE_UNIT_PRICE_IS_WITH_TAX', True)
+TAX_RATE_CACHE_SIZE = getattr(settings, 'COMMERCE_TAX_RATE_CACHE_SIZE', 1024)
+TAX_RATE_CACHE_TIMEOUT = getattr(settings, 'COMMERCE_TAX_RATE_CACHE_TIMEOUT', 60 * 60)  # in seconds
+DISCOUNT_INDEX_CACHE_TIMEOUT = getattr(settings, 'COMMERCE_DISCOUNT_INDEX_CACHE_TIMEOUT', 60 * 60)  # in seconds
+SHIPPING_MATRIX_CACHE_TIMEOUT = getattr(settings, 'COMMERCE_SHIPPING_MATRIX_CACHE_TIMEOUT', 60 * 60)  # in seconds
+PROMOTED_DISCOUNTS_CACHE_TIMEOUT = getattr(settings, 'COMMERCE_PROMOTED_DISCOUNTS_CACHE_TIMEOUT', 60 * 60)  # in seconds, at most until the first promoted discount expires
+INVOICE_PDF_CACHE = getattr(settings, 'COMMERCE_INVOICE_PDF_CACHE', 'default')  # cache alias
+INVOICE_PDF_CACHE_TIMEOUT = getattr(settings, 'COMMERCE_INVOICE_PDF_CACHE_TIMEOUT', 60 * 60 * 24)  # in seconds
 BANK_API_TOKEN = getattr(settings, 'COMMERCE_BANK_API_TOKEN', None)
 BANK_API = getattr(settings, 'COMMERCE_BANK_API', None)
+BANK_API_TIMEOUT = getattr(settings, 'COMMERCE_BANK_API_TIMEOUT', 60)  # in seconds
+BANK_ADAPTERS = getattr(settings, 'COMMERCE_BANK_ADAPTERS', {
+    'FIO': 'commerce.banks.FioBankAdapter',
+})
 GATEWAY_GP_MERCHANT_NUMBER = getattr(settings, 'COMMERCE_GATEWAY_GP_MERCHANT_NUMBER', None)
 GATEWAY_GP_PRIVATE_KEY_PASSWORD = getattr(settings, 'COMMERCE_GATEWAY_GP_PRIVATE_KEY_PASSWORD', None)
 GATEWAY_GP_PRIVATE_KEY_PATH = getattr(settings, 'COMMERCE_GATEWAY_GP_PRIVATE_KEY_PATH', None)
 GATEWAY_GP_PUBLIC_KEY_PATH = getattr(settings, 'COMMERCE_GATEWAY_GP_PUBLIC_KEY_PATH', None)
 GATEWAY_GP_ORDER_NUMBER_STARTS_FROM = getattr(settings, 'COMMERCE_GATEWAY_GP_ORDER_NUMBER_STARTS_FROM', 1)
 GATEWAY_GP_DEBUG = getattr(settings, 'COMMERCE_GATEWAY_GP_DEBUG', False)
+GATEWAY_GP_PAYMENT_TTL = getattr(settings, 'COMMERCE_GATEWAY_GP_PAYMENT_TTL', 15 * 60)  # in seconds, open payment and its URL are reused
 GATEWAY_GP_URL = 'https://3dsecure.gpwebpay.com/pgw/order.do'
 GATEWAY_GP_URL_TEST = 'https://test.3dsecure.gpwebpay.com/pgw/order.do'
 GATEWAY_STRIPE_PUBLISHABLE_API_KEY = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_PUBLISHABLE_API_KEY', None)
 GATEWAY_STRIPE_SECRET_API_KEY = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_SECRET_API_KEY', None)
 GATEWAY_STRIPE_ENDPOINT_SECRET = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_ENDPOINT_SECRET', None)
+GATEWAY_STRIPE_CLIENT = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_CLIENT', None)  # path to Stripe module replacement
+GATEWAY_STRIPE_SESSION_EXPIRATION_MARGIN = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_SESSION_EXPIRATION_MARGIN', 30)  # in minutes
 GATEWAY_STRIPE_PAYMENT_URL = getattr(settings, 'COMMERCE_GATEWAY_STRIPE_PAYMENT_URL', reverse_lazy('commerce:orders'))
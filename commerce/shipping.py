@@ -0,0 +1,58 @@
+from django.core.cache import cache
+
+from commerce import settings as commerce_settings
+
+SHIPPING_MATRIX_CACHE_KEY = 'commerce_shipping_matrix'
+
+
+class ShippingMatrix(object):
+    """
+    Shipping options available in countries and payment methods allowed for shipping options.
+
+    Options without countries are general, they are available only in countries without specific options
+    (the same as ShippingOptionQuerySet.for_country()).
+    """
+    def __init__(self, shipping_options, payment_methods, payment_shippings):
+        self.shipping_options = shipping_options
+        self.payment_methods = payment_methods
+        self.payment_shippings = payment_shippings  # payment method ID: set of shipping option IDs
+        self.country_shipping_options = {}
+        self.general_shipping_options = []
+
+        for shipping_option in shipping_options:
+            if not shipping_option.countries:
+                self.general_shipping_options.append(shipping_option)
+
+            for country in shipping_option.countries:
+                self.country_shipping_options.setdefault(str(country), []).append(shipping_option)
+
+    @classmethod
+    def build(cls):
+        from commerce.models import ShippingOption, PaymentMethod
+
+        payment_shippings = {}
+
+        for payment_method_id, shipping_option_id in PaymentMethod.shippings.through.objects.values_list('paymentmethod_id', 'shippingoption_id'):
+            payment_shippings.setdefault(payment_method_id, set()).add(shipping_option_id)
+
+        return cls(list(ShippingOption.objects.all()), list(PaymentMethod.objects.all()), payment_shippings)
+
+    def get_shipping_options(self, country):
+        return self.country_shipping_options.get(str(country or ''), self.general_shipping_options)
+
+    def is_payment_method_allowed(self, payment_method, shipping_option):
+        return shipping_option.id in self.payment_shippings.get(payment_method.id, set())
+
+
+def get_shipping_matrix():
+    matrix = cache.get(SHIPPING_MATRIX_CACHE_KEY)
+
+    if matrix is None:
+        matrix = ShippingMatrix.build()
+        cache.set(SHIPPING_MATRIX_CACHE_KEY, matrix, commerce_settings.SHIPPING_MATRIX_CACHE_TIMEOUT)
+
+    return matrix
+
+
+def invalidate_shipping_matrix():
+    cache.delete(SHIPPING_MATRIX_CACHE_KEY)
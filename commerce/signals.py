@@ -1,11 +1,19 @@
 import django.dispatch
-from django.db.models.signals import pre_save
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
 from django.dispatch import receiver
 from invoicing.models import Invoice
 
 from commerce import settings as commerce_settings
-from commerce.models import Order, Cart
-from commerce.tasks import notify_about_new_order, notify_about_changed_order_status_in_background
+from commerce.discounts import invalidate_discount_index, invalidate_promoted_discounts
+from commerce.loyalty import sync_order_loyalty_points
+from commerce.models import Order, Cart, Discount, Supply, PurchasedItem, ShippingOption, PaymentMethod
+from commerce.stock import remember_stock_contribution, update_stock_contribution, apply_stock_contribution, \
+    get_stock_contribution, apply_order_stock_delta, order_reserves_stock
+from commerce.shipping import invalidate_shipping_matrix
+from commerce.taxation import invalidate_taxation
+from commerce.tasks import process_new_order, notify_about_changed_order_status_in_background
 from pragmatic.signals import apm_custom_context, SignalsHelper
 
 checkout_finished = django.dispatch.Signal()
@@ -16,18 +24,8 @@ invoice_created = django.dispatch.Signal()
 @receiver(checkout_finished, sender=Cart)
 @apm_custom_context('signals')
 def order_created(sender, order, **kwargs):
-    if not order.invoices.all().exists():
-        if order.status == Order.STATUS_AWAITING_PAYMENT and commerce_settings.CREATE_PROFORMA_INVOICE:
-            # create proforma invoice
-            order.create_invoice(type=Invoice.TYPE.PROFORMA, status=Invoice.STATUS.NEW, creator=order.user)
-
-        # only if order status == payment received? (NO!, because we need to create invoice for orders with total = 0 and status pending as well)
-        elif order.status not in [Order.STATUS_AWAITING_PAYMENT, Order.STATUS_CANCELLED]:
-            # create invoice if paid
-            order.create_invoice(type=Invoice.TYPE.INVOICE, status=Invoice.STATUS.PAID, creator=order.user)
-
-    # notify stuff and customer
-    notify_about_new_order.delay(order)
+    # Note: loyalty points of order are synced on its save, totals are frozen before
+    transaction.on_commit(lambda: process_new_order.delay(order))
 
 
 @receiver(pre_save, sender=Order)
@@ -42,3 +40,75 @@ def order_status_changed(sender, instance, **kwargs):
         # notify customer
         if instance.status in commerce_settings.NOTIFY_ABOUT_STATUSES:
             SignalsHelper.add_task_and_connect(sender, instance, notify_about_changed_order_status_in_background, [instance])
+
+
+@receiver(post_save, sender=Discount)
+@receiver(post_delete, sender=Discount)
+@receiver(m2m_changed, sender=Discount.content_types.through)
+@receiver(post_delete, sender=Discount.products.through)
+def discount_changed(sender, **kwargs):
+    # products (gm2m) and content types are saved after discount itself (e.g. in admin)
+    transaction.on_commit(invalidate_discount_index)
+    transaction.on_commit(invalidate_promoted_discounts)
+
+
+@receiver(post_save, sender=ShippingOption)
+@receiver(post_delete, sender=ShippingOption)
+@receiver(post_save, sender=PaymentMethod)
+@receiver(post_delete, sender=PaymentMethod)
+@receiver(m2m_changed, sender=PaymentMethod.shippings.through)
+def shipping_changed(sender, **kwargs):
+    transaction.on_commit(invalidate_shipping_matrix)
+
+
+@receiver(setting_changed)
+def taxation_setting_changed(setting, **kwargs):
+    if setting in ['INVOICING_TAXATION_POLICY', 'INVOICING_SUPPLIER', 'INVOICING_USE_VIES_VALIDATOR']:
+        invalidate_taxation()
+
+
+@receiver(pre_save, sender=Supply)
+@receiver(pre_save, sender=PurchasedItem)
+def stock_entry_saving(sender, instance, **kwargs):
+    remember_stock_contribution(instance)
+
+
+@receiver(post_save, sender=Supply)
+@receiver(post_save, sender=PurchasedItem)
+def stock_entry_saved(sender, instance, **kwargs):
+    update_stock_contribution(instance)
+
+
+@receiver(post_delete, sender=Supply)
+@receiver(post_delete, sender=PurchasedItem)
+def stock_entry_deleted(sender, instance, **kwargs):
+    apply_stock_contribution(get_stock_contribution(instance), -1)
+
+
+@receiver(pre_save, sender=Order)
+def order_stock_reservation_changed(sender, instance, **kwargs):
+    if not instance.pk:
+        return
+
+    stored_status = Order.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+    if stored_status is None:
+        return
+
+    reserved_before = order_reserves_stock(stored_status)
+    reserved_after = order_reserves_stock(instance.status)
+
+    # status changed into or out of cancelled/refunded
+    if reserved_before != reserved_after:
+        apply_order_stock_delta(instance, 1 if reserved_after else -1)
+
+
+@receiver(post_save, sender=Order)
+def order_loyalty_points_changed(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or not commerce_settings.LOYALTY_PROGRAM_ENABLED:
+        return
+
+    if update_fields is not None and not {'status', 'loyalty_points'} & set(update_fields):
+        return
+
+    sync_order_loyalty_points(instance)
@@ -0,0 +1,127 @@
+from django.db import transaction, IntegrityError
+from django.db.models import F, Sum
+from django.utils.timezone import now
+
+from commerce.models import StockLevel, Supply, PurchasedItem, Order
+
+
+def order_reserves_stock(status):
+    # the same statuses as PurchasedItemQuerySet.of_not_cancelled_nor_refunded_orders()
+    return status not in [
+        Order.STATUS_CANCELLED,
+        Order.STATUS_REFUNDED,
+        Order.STATUS_PARTIALLY_REFUNDED,
+    ]
+
+
+def apply_stock_delta(content_type_id, object_id, option_id, supplies=0, purchased=0):
+    if not supplies and not purchased:
+        return
+
+    levels = StockLevel.objects.filter(content_type_id=content_type_id, object_id=object_id, option_id=option_id)
+    changes = {
+        'supplies': F('supplies') + supplies,
+        'purchased': F('purchased') + purchased,
+        'modified': now()
+    }
+
+    if levels.update(**changes):
+        return
+
+    try:
+        with transaction.atomic():
+            StockLevel.objects.create(
+                content_type_id=content_type_id,
+                object_id=object_id,
+                option_id=option_id,
+                supplies=supplies,
+                purchased=purchased
+            )
+    except IntegrityError:
+        # stock level was created concurrently
+        levels.update(**changes)
+
+
+def get_stock_contribution(entry):
+    """
+    Returns stock key and quantities which supply or purchased item adds to stock level
+    """
+    key = (entry.content_type_id, entry.object_id, entry.option_id)
+
+    if isinstance(entry, Supply):
+        return key, entry.quantity, 0
+
+    purchased = entry.quantity if order_reserves_stock(entry.order.status) else 0
+    return key, 0, purchased
+
+
+def apply_stock_contribution(contribution, sign=1):
+    key, supplies, purchased = contribution
+    apply_stock_delta(*key, supplies=sign * supplies, purchased=sign * purchased)
+
+
+def remember_stock_contribution(entry):
+    # called before save: contribution of entry stored in database
+    stored_entry = type(entry).objects.filter(pk=entry.pk).first() if entry.pk else None
+    entry._stored_stock_contribution = get_stock_contribution(stored_entry) if stored_entry else None
+
+
+def update_stock_contribution(entry):
+    # called after save: replace stored contribution with the current one
+    stored_contribution = getattr(entry, '_stored_stock_contribution', None)
+
+    if stored_contribution:
+        apply_stock_contribution(stored_contribution, -1)
+
+    apply_stock_contribution(get_stock_contribution(entry))
+    entry._stored_stock_contribution = None
+
+
+def apply_order_stock_delta(order, sign):
+    apply_orders_stock_delta([order.pk], sign)
+
+
+def apply_orders_stock_delta(order_ids, sign):
+    purchased_items = PurchasedItem.objects\
+        .filter(order_id__in=order_ids)\
+        .values('content_type', 'object_id', 'option')\
+        .annotate(quantity=Sum('quantity'))\
+        .order_by()
+
+    for item in purchased_items:
+        apply_stock_delta(item['content_type'], item['object_id'], item['option'], purchased=sign * item['quantity'])
+
+
+def rebuild_stock_levels():
+    """
+    Recalculates all stock levels from supplies and purchased items
+    """
+    levels = {}
+
+    supplies = Supply.objects\
+        .values('content_type', 'object_id', 'option')\
+        .annotate(quantity=Sum('quantity'))\
+        .order_by()
+
+    for supply in supplies:
+        key = (supply['content_type'], supply['object_id'], supply['option'])
+        levels.setdefault(key, {'supplies': 0, 'purchased': 0})['supplies'] = supply['quantity']
+
+    purchased_items = PurchasedItem.objects\
+        .of_not_cancelled_nor_refunded_orders()\
+        .values('content_type', 'object_id', 'option')\
+        .annotate(quantity=Sum('quantity'))\
+        .order_by()
+
+    for item in purchased_items:
+        key = (item['content_type'], item['object_id'], item['option'])
+        levels.setdefault(key, {'supplies': 0, 'purchased': 0})['purchased'] = item['quantity']
+
+    with transaction.atomic():
+        StockLevel.objects.all().delete()
+        StockLevel.objects.bulk_create([
+            StockLevel(content_type_id=content_type_id, object_id=object_id, option_id=option_id, **quantities)
+            for (content_type_id, object_id, option_id), quantities in levels.items()
+        ], batch_size=1000)
+
+    return len(levels)
@@ -1,17 +1,42 @@
 from django.utils.translation import override as override_language
 from django_rq import job
 from invoicing.models import Invoice
-from invoicing.utils import get_invoices_in_pdf
 
 from pragmatic.managers import EmailManager
 from pragmatic.signals import apm_custom_context
 
 from commerce import settings as commerce_settings
+from commerce.invoices import get_invoices_in_pdf
 from commerce.models import Order
 
 from django.utils.translation import gettext_lazy as _
 
 
+@job(commerce_settings.REDIS_QUEUE)
+@apm_custom_context('tasks')
+def process_new_order(order):
+    # status could change since checkout (e.g. payment received)
+    order.refresh_from_db()
+    create_invoice_of_new_order(order)
+
+    # notify stuff and customer (with invoice attached)
+    notify_about_new_order(order)
+
+
+def create_invoice_of_new_order(order):
+    if order.invoices.all().exists():
+        return
+
+    if order.status == Order.STATUS_AWAITING_PAYMENT and commerce_settings.CREATE_PROFORMA_INVOICE:
+        # create proforma invoice
+        order.create_invoice(type=Invoice.TYPE.PROFORMA, status=Invoice.STATUS.NEW, creator=order.user)
+
+    # only if order status == payment received? (NO!, because we need to create invoice for orders with total = 0 and status pending as well)
+    elif order.status not in [Order.STATUS_AWAITING_PAYMENT, Order.STATUS_CANCELLED]:
+        # create invoice if paid
+        order.create_invoice(type=Invoice.TYPE.INVOICE, status=Invoice.STATUS.PAID, creator=order.user)
+
+
 @job(commerce_settings.REDIS_QUEUE)
 @apm_custom_context('tasks')
 def notify_about_new_order(order):
@@ -52,6 +77,13 @@ def notify_about_changed_order_status(order):
         )
 
 
+@job(commerce_settings.REDIS_QUEUE)
+@apm_custom_context('tasks')
+def notify_about_changed_orders_status(order_ids):
+    for order in Order.objects.filter(id__in=order_ids).select_related('user'):
+        notify_about_changed_order_status(order)
+
+
 @job(commerce_settings.REDIS_QUEUE)
 @apm_custom_context('tasks')
 def notify_about_changed_order_status_in_background(order):
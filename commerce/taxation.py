@@ -0,0 +1,82 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+from django.utils.timezone import localdate
+from invoicing.models import default_supplier
+from invoicing.taxation.eu import EUTaxationPolicy
+
+from commerce import settings as commerce_settings
+
+
+@lru_cache(maxsize=None)
+def get_taxation_policy():
+    taxation_policy = getattr(settings, 'INVOICING_TAXATION_POLICY', None)
+
+    if taxation_policy is not None:
+        return import_string(taxation_policy)
+
+    supplier_country = default_supplier('country_code')
+    if supplier_country and EUTaxationPolicy.is_in_EU(supplier_country):
+        return EUTaxationPolicy
+
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_supplier_vat_id():
+    return default_supplier('vat_id')
+
+
+class TaxRateCache(object):
+    """
+    LRU cache of tax rates with TTL, shared by all threads of the process.
+
+    Tax rate of the policy depends on supplier VAT ID, customer VAT ID (its prefix is the customer country)
+    and tax point date, so the expiration only limits how long VIES validation result is trusted.
+    """
+    def __init__(self, maxsize=None, timeout=None):
+        self.maxsize = int(maxsize if maxsize is not None else commerce_settings.TAX_RATE_CACHE_SIZE)
+        self.timeout = timeout if timeout is not None else commerce_settings.TAX_RATE_CACHE_TIMEOUT
+        self.lock = threading.Lock()
+        self.rates = OrderedDict()  # key: (expires, tax rate)
+
+    def get_tax_rate(self, policy, supplier_vat_id, customer_vat_id, date_tax_point=None):
+        date_tax_point = date_tax_point or localdate()
+        key = (policy, supplier_vat_id, customer_vat_id or '', date_tax_point)
+
+        with self.lock:
+            cached = self.rates.get(key)
+
+            if cached is not None and cached[0] > time.monotonic():
+                self.rates.move_to_end(key)
+                return cached[1]
+
+        # resolve outside of the lock, policy may call VIES
+        tax_rate = policy.get_tax_rate(supplier_vat_id, customer_vat_id, date_tax_point)
+
+        if self.maxsize > 0:
+            with self.lock:
+                self.rates[key] = (time.monotonic() + self.timeout, tax_rate)
+                self.rates.move_to_end(key)
+
+                while len(self.rates) > self.maxsize:
+                    self.rates.popitem(last=False)
+
+        return tax_rate
+
+    def clear(self):
+        with self.lock:
+            self.rates.clear()
+
+
+tax_rate_cache = TaxRateCache()
+
+
+def invalidate_taxation():
+    get_taxation_policy.cache_clear()
+    get_supplier_vat_id.cache_clear()
+    tax_rate_cache.clear()
@@ -1,10 +1,9 @@
 from decimal import Decimal
 
 from django import template
-from django.core.exceptions import ObjectDoesNotExist
 from django.core.validators import EMPTY_VALUES
 
-from commerce.context_processors import discount_codes
+from commerce.discounts import get_discounts_for_products
 from commerce.models import Discount, AbstractProduct
 
 register = template.Library()
@@ -12,26 +11,20 @@ register = template.Library()
 
 @register.simple_tag(takes_context=True)
 def discount_for_product(context, product):
-    valid_product_discounts = Discount.objects.for_product(product).valid()
+    return get_discounts_for_products(context['request'], [product])[product.pk]
 
-    # promoted discount
-    valid_promoted_infinite_codes = discount_codes(context['request'])['valid_promoted_discount_codes'].for_product(product)
-    discount = valid_promoted_infinite_codes.first()
 
-    try:
-        # cart discount
-        user = context['request'].user
-
-        if user.cart.discount:
-            discount = user.cart.discount
-    except (ObjectDoesNotExist, AttributeError):
-        pass
+@register.simple_tag(takes_context=True)
+def discount_for_products(context, products):
+    """
+    Usage: {% discount_for_products object_list as discounts %}
+    """
+    return get_discounts_for_products(context['request'], products)
 
-    if discount:
-        discount = valid_product_discounts.filter(id=discount.id).first()
-        return discount
 
-    return None
+@register.filter()
+def discount_of_product(discounts, product):
+    return discounts.get(product.pk, None)
 
 
 @register.filter()
@@ -49,6 +42,19 @@ def percentage_discount_price(price, amount):
     return discount_price
 
 
+@register.filter()
+def product_percentage_discount_price(product, discounts):
+    """
+    Usage: {{ product|product_percentage_discount_price:discounts }}
+    """
+    discount = discounts.get(product.pk, None)
+
+    if discount and discount.unit == Discount.UNIT_PERCENTAGE:
+        return percentage_discount_price(product.price, discount.amount)
+
+    return product.price
+
+
 @register.filter()
 def in_stock(product, option):
     return option.in_stock(product)
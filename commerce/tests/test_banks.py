@@ -0,0 +1,77 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce import settings as commerce_settings
+from commerce.banks import BankAdapter, FioBankAdapter
+
+API_URL = 'https://www.fio.cz/ib_api/rest'
+
+
+def get_response(status_code=200, data=None):
+    response = mock.Mock(status_code=status_code)
+    response.json.return_value = data
+    return response
+
+
+@mock.patch('commerce.banks.time.sleep')
+@mock.patch('commerce.banks.requests.get')
+class FioBankAdapterTest(SimpleTestCase):
+    def setUp(self):
+        self.adapter = FioBankAdapter('token')
+
+    def test_timeout(self, get, sleep):
+        get.return_value = get_response()
+        self.adapter.request(f'{API_URL}/last/token/transactions.json', stream=True)
+
+        get.assert_called_once_with(f'{API_URL}/last/token/transactions.json', timeout=commerce_settings.BANK_API_TIMEOUT, stream=True)
+        sleep.assert_not_called()
+
+    def test_throttling(self, get, sleep):
+        get.side_effect = [get_response(409), get_response()]
+        self.adapter.request(f'{API_URL}/last/token/transactions.json')
+
+        self.assertEqual(get.call_count, 2)
+        sleep.assert_called_once_with(FioBankAdapter.throttling_delay)
+
+    def test_throttling_retries(self, get, sleep):
+        response = get_response(409)
+        response.raise_for_status.side_effect = Exception('409 Conflict')
+        get.return_value = response
+
+        with self.assertRaisesMessage(Exception, '409 Conflict'):
+            self.adapter.request(f'{API_URL}/last/token/transactions.json')
+
+        self.assertEqual(get.call_count, FioBankAdapter.max_retries + 1)
+
+    def test_reset_cursor(self, get, sleep):
+        get.return_value = get_response()
+        self.adapter.reset_cursor('1001')
+        self.adapter.reset_cursor(None)
+
+        get.assert_called_once_with(f'{API_URL}/set-last-id/token/1001/', timeout=commerce_settings.BANK_API_TIMEOUT)
+
+    def test_reset_cursor_of_other_banks(self, get, sleep):
+        BankAdapter('token').reset_cursor('1001')
+        get.assert_not_called()
+
+    @mock.patch('commerce.banks.ijson', None)
+    def test_transactions(self, get, sleep):
+        get.return_value = get_response(data={'accountStatement': {'transactionList': {'transaction': [{
+            'column22': {'value': 1001},
+            'column0': {'value': '2026-10-01+0200'},
+            'column1': {'value': 120.5},
+            'column14': {'value': 'EUR'},
+            'column5': {'value': '100'},
+        }]}}})
+        transactions = list(self.adapter.get_transactions('1000'))
+
+        # server side mark is not moved back without request
+        get.assert_called_once_with(f'{API_URL}/last/token/transactions.json', timeout=commerce_settings.BANK_API_TIMEOUT, stream=True)
+        self.assertEqual(len(transactions), 1)
+        self.assertEqual(transactions[0]['id'], '1001')
+        self.assertEqual(transactions[0]['date'], '2026-10-01')
+        self.assertEqual(transactions[0]['value'], Decimal('120.5'))
+        self.assertEqual(transactions[0]['variable_symbol'], '100')
+        self.assertIsNone(transactions[0]['sender'])
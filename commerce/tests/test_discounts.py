@@ -0,0 +1,53 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db.models.signals import post_delete
+from django.test import SimpleTestCase
+
+from commerce import discounts
+from commerce.discounts import DiscountIndex, get_discount_index, invalidate_discount_index
+from commerce.models import Discount
+
+
+class DiscountIndexTest(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+        self.build = mock.patch.object(DiscountIndex, 'build', side_effect=lambda version=None: DiscountIndex({}, {}, set(), version)).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_cached(self):
+        get_discount_index()
+        get_discount_index()
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_invalidated(self):
+        get_discount_index()
+        invalidate_discount_index()
+        index = get_discount_index()
+        get_discount_index()
+        self.assertEqual(self.build.call_count, 2)
+        self.assertEqual(index.version, 1)
+
+    def test_stale_index(self):
+        # index built before invalidation is stored after it
+        stale_index = DiscountIndex({}, {}, set(), cache.get(discounts.DISCOUNT_INDEX_VERSION_CACHE_KEY))
+        invalidate_discount_index()
+        cache.set(discounts.DISCOUNT_INDEX_CACHE_KEY, stale_index)
+
+        self.assertIsNot(get_discount_index(), stale_index)
+        self.assertEqual(self.build.call_count, 1)
+
+    def test_removed_products_invalidate_index(self):
+        self.assertTrue(post_delete.has_listeners(Discount.products.through))
+
+
+class DiscountIdsTest(SimpleTestCase):
+    def test_get_discount_ids(self):
+        index = DiscountIndex(
+            product_discounts={(1, '10'): {1}},
+            content_type_discounts={1: {2}, 2: {3}},
+            general_discounts={4}
+        )
+        self.assertEqual(index.get_discount_ids(1, 10), {1, 2, 4})
+        self.assertEqual(index.get_discount_ids(1, 11), {2, 4})
+        self.assertEqual(index.get_discount_ids(3, 10), {4})
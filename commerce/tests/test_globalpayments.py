@@ -0,0 +1,44 @@
+import os
+import tempfile
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce.gateways.globalpayments.keys import KeyStore
+
+
+class KeyStoreTest(SimpleTestCase):
+    def setUp(self):
+        key_file = tempfile.NamedTemporaryFile('w', suffix='.pem', delete=False)
+        key_file.write('KEY')
+        key_file.close()
+        self.path = key_file.name
+        self.addCleanup(os.remove, self.path)
+        self.key_store = KeyStore()
+        self.loader = mock.Mock(side_effect=lambda key: object())
+
+    def test_cached(self):
+        key = self.key_store.get('private', self.path, self.loader, b'secret')
+
+        self.assertIs(self.key_store.get('private', self.path, self.loader, b'secret'), key)
+        self.loader.assert_called_once_with('KEY')
+
+    def test_password_changed(self):
+        key = self.key_store.get('private', self.path, self.loader, b'secret')
+
+        self.assertIsNot(self.key_store.get('private', self.path, self.loader, b'changed'), key)
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_file_changed(self):
+        key = self.key_store.get('public', self.path, self.loader)
+        mtime = os.stat(self.path).st_mtime
+        os.utime(self.path, (mtime + 10, mtime + 10))
+
+        self.assertIsNot(self.key_store.get('public', self.path, self.loader), key)
+        self.assertEqual(self.loader.call_count, 2)
+
+    def test_clear(self):
+        self.key_store.get('public', self.path, self.loader)
+        self.key_store.clear()
+        self.key_store.get('public', self.path, self.loader)
+        self.assertEqual(self.loader.call_count, 2)
@@ -0,0 +1,51 @@
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from commerce import settings as commerce_settings
+from commerce.invoices import get_invoices_in_pdf
+
+
+class Invoices(list):
+    def annotate(self, **kwargs):
+        return self
+
+
+def render(invoices):
+    # the same file name of invoices with the same number
+    return [{'name': f'{invoice.number}.pdf', 'content': f'PDF {invoice.pk}'} for invoice in invoices]
+
+
+@mock.patch('commerce.invoices.invoicing_utils.get_invoices_in_pdf', side_effect=render)
+class InvoicesInPdfTest(SimpleTestCase):
+    def setUp(self):
+        caches[commerce_settings.INVOICE_PDF_CACHE].clear()
+        modified = datetime(2026, 10, 1, tzinfo=timezone.utc)
+        self.invoices = Invoices([
+            SimpleNamespace(pk=1, number='2026001', modified=modified, items_modified=None),
+            SimpleNamespace(pk=2, number='2026001', modified=modified, items_modified=None),
+        ])
+
+    def test_rendered_one_by_one(self, get_invoices_in_pdf_mock):
+        files = get_invoices_in_pdf(self.invoices)
+
+        self.assertEqual([file['content'] for file in files], ['PDF 1', 'PDF 2'])
+        self.assertEqual(get_invoices_in_pdf_mock.call_args_list, [mock.call([invoice]) for invoice in self.invoices])
+
+    def test_cached(self, get_invoices_in_pdf_mock):
+        get_invoices_in_pdf(self.invoices)
+        files = get_invoices_in_pdf(self.invoices)
+
+        self.assertEqual([file['content'] for file in files], ['PDF 1', 'PDF 2'])
+        self.assertEqual(get_invoices_in_pdf_mock.call_count, 2)
+
+    def test_modified(self, get_invoices_in_pdf_mock):
+        get_invoices_in_pdf(self.invoices)
+        self.invoices[1].items_modified = datetime(2026, 10, 2, tzinfo=timezone.utc)
+        get_invoices_in_pdf(self.invoices)
+
+        self.assertEqual(get_invoices_in_pdf_mock.call_args_list[-1], mock.call([self.invoices[1]]))
+        self.assertEqual(get_invoices_in_pdf_mock.call_count, 3)
@@ -0,0 +1,49 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce import settings as commerce_settings
+from commerce.loyalty import sync_order_loyalty_points
+from commerce.models import LoyaltyTransaction, Order
+
+
+@mock.patch.object(commerce_settings, 'LOYALTY_POINTS_PER_CURRENCY_UNIT', 1)
+@mock.patch('commerce.loyalty.invalidate_balance')
+@mock.patch.object(LoyaltyTransaction, 'objects')
+class SyncOrderLoyaltyPointsTest(SimpleTestCase):
+    def sync(self, objects, order, earned=0, spent=0):
+        with mock.patch('commerce.loyalty.get_transactions_summary', return_value={'earned': earned, 'spent': spent, 'balance': earned - spent}):
+            sync_order_loyalty_points(order)
+
+        return [(t.type, t.points) for call in objects.bulk_create.call_args_list for t in call.args[0]]
+
+    def get_order(self, status):
+        return Order(user_id=1, status=status, total=Decimal('100.50'), loyalty_points=20)
+
+    def test_paid_order(self, objects, invalidate_balance):
+        transactions = self.sync(objects, self.get_order(Order.STATUS_PAYMENT_RECEIVED))
+
+        self.assertEqual(transactions, [(LoyaltyTransaction.TYPE_EARN, 100), (LoyaltyTransaction.TYPE_SPEND, -20)])
+        invalidate_balance.assert_called_once_with(1)
+
+    def test_awaiting_payment(self, objects, invalidate_balance):
+        # points are spent, but not earned yet
+        transactions = self.sync(objects, self.get_order(Order.STATUS_AWAITING_PAYMENT))
+        self.assertEqual(transactions, [(LoyaltyTransaction.TYPE_SPEND, -20)])
+
+    def test_cancelled_order(self, objects, invalidate_balance):
+        transactions = self.sync(objects, self.get_order(Order.STATUS_CANCELLED), earned=100, spent=20)
+        self.assertEqual(transactions, [(LoyaltyTransaction.TYPE_REVERSAL, -100), (LoyaltyTransaction.TYPE_REVERSAL, 20)])
+
+    def test_synced(self, objects, invalidate_balance):
+        transactions = self.sync(objects, self.get_order(Order.STATUS_PAYMENT_RECEIVED), earned=100, spent=20)
+
+        self.assertEqual(transactions, [])
+        invalidate_balance.assert_not_called()
+
+    def test_anonymous_order(self, objects, invalidate_balance):
+        order = self.get_order(Order.STATUS_PAYMENT_RECEIVED)
+        order.user_id = None
+
+        self.assertEqual(self.sync(objects, order), [])
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError
+from django.test import SimpleTestCase
+
+from commerce.models import NumberCounter
+from commerce.numbering import CounterOrderNumberAllocator, SequenceOrderNumberAllocator
+
+
+@mock.patch('commerce.numbering.transaction')
+@mock.patch.object(NumberCounter, 'save')
+@mock.patch.object(NumberCounter, 'objects')
+class CounterOrderNumberAllocatorTest(SimpleTestCase):
+    def setUp(self):
+        self.allocator = CounterOrderNumberAllocator()
+        self.get_first_number = mock.patch.object(self.allocator, 'get_first_number', return_value=100).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_existing_counter(self, objects, save, transaction):
+        objects.select_for_update.return_value.get.return_value = NumberCounter(name='order', last_number=41)
+
+        self.assertEqual(self.allocator.get_next_number(), 42)
+        self.get_first_number.assert_not_called()
+        objects.create.assert_not_called()
+
+    def test_missing_counter(self, objects, save, transaction):
+        objects.select_for_update.return_value.get.side_effect = NumberCounter.DoesNotExist
+        objects.create.side_effect = lambda **kwargs: NumberCounter(**kwargs)
+
+        self.assertEqual(self.allocator.get_next_number(), 100)
+        objects.create.assert_called_once_with(name='order', last_number=99)
+
+    def test_counter_created_concurrently(self, objects, save, transaction):
+        objects.select_for_update.return_value.get.side_effect = [
+            NumberCounter.DoesNotExist,
+            NumberCounter(name='order', last_number=100)
+        ]
+        objects.create.side_effect = IntegrityError
+
+        self.assertEqual(self.allocator.get_next_number(), 101)
+
+
+class SequenceOrderNumberAllocatorTest(SimpleTestCase):
+    def setUp(self):
+        self.allocator = SequenceOrderNumberAllocator(block_size=10)
+        mock.patch.object(self.allocator, 'get_first_number', return_value=100).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_block(self):
+        mock.patch.object(self.allocator, 'check_sequence').start()
+        connection = mock.patch('commerce.numbering.connection').start()
+        connection.cursor.return_value.__enter__.return_value.fetchone.side_effect = [(100,), (130,)]
+
+        numbers = [self.allocator.get_next_number() for i in range(12)]
+        self.assertEqual(numbers, list(range(100, 110)) + [130, 131])
+
+    def test_matching_sequence(self):
+        mock.patch.object(self.allocator, 'get_sequence', return_value=(10, 120, True)).start()
+        seed_sequence = mock.patch.object(self.allocator, 'seed_sequence').start()
+
+        self.allocator.check_sequence()
+        seed_sequence.assert_not_called()
+
+    def test_seed_new_sequence(self):
+        # created by migration, no number was taken yet
+        mock.patch.object(self.allocator, 'get_sequence', return_value=(1, 1, False)).start()
+        seed_sequence = mock.patch.object(self.allocator, 'seed_sequence').start()
+
+        self.allocator.check_sequence()
+        seed_sequence.assert_called_once_with()
+
+    def test_used_sequence_mismatch(self):
+        mock.patch.object(self.allocator, 'get_sequence', return_value=(1, 120, True)).start()
+
+        with self.assertRaises(ImproperlyConfigured):
+            self.allocator.check_sequence()
@@ -0,0 +1,40 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce import settings as commerce_settings
+from commerce.models import Order, Discount
+
+
+@mock.patch.object(commerce_settings, 'CURRENCY_UNITS_PER_LOYALTY_POINT', Decimal('0.10'))
+@mock.patch.object(Order, 'is_taxed', return_value=False)
+class OrderTotalsTest(SimpleTestCase):
+    def get_order(self, **kwargs):
+        return Order(shipping_fee=Decimal('3.00'), payment_fee=Decimal('1.00'), **kwargs)
+
+    def test_totals(self, is_taxed):
+        order = self.get_order()
+        order.calculate_totals(items_subtotal=Decimal('40.00'))
+
+        self.assertEqual(order.items_subtotal, Decimal('40.00'))
+        self.assertEqual(order.credit, Decimal('0.00'))
+        self.assertEqual(order.subtotal, Decimal('40.00'))
+        self.assertEqual((order.total, order.tax, order.total_in_cents), (Decimal('44.00'), None, 4400))
+
+    def test_credit(self, is_taxed):
+        order = self.get_order(loyalty_points=50, discount=Discount(amount=Decimal('5.00'), unit=Discount.UNIT_CURRENCY))
+        order.calculate_totals(items_subtotal=Decimal('40.00'))
+
+        self.assertEqual(order.credit, Decimal('10.00'))
+        self.assertEqual(order.total, Decimal('34.00'))
+
+    def test_credit_exceeds_items(self, is_taxed):
+        order = self.get_order(loyalty_points=500)
+        order.calculate_totals(items_subtotal=Decimal('40.00'))
+
+        self.assertEqual(order.subtotal, 0)
+        self.assertEqual(order.total, Decimal('4.00'))
+
+    def test_unsaved_order(self, is_taxed):
+        self.assertEqual(Order().subtotal, 0)
@@ -0,0 +1,122 @@
+import os
+from decimal import Decimal
+from importlib import import_module
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce.banks import FileStatementAdapter
+from commerce.models import BankTransaction, Order
+from commerce.reconciliation import OpenOrder, OpenOrderIndex, reconcile, get_paid_order_ids, normalize_variable_symbol
+
+STATEMENT_PATH = os.path.join(os.path.dirname(__file__), 'fixtures', 'statement.csv')
+
+
+class FileStatementAdapterTest(SimpleTestCase):
+    def test_transactions(self):
+        transactions = list(FileStatementAdapter(STATEMENT_PATH).get_transactions())
+
+        self.assertEqual(len(transactions), 9)
+        self.assertEqual(transactions[0], {
+            'id': '1001',
+            'date': '2026-10-01',
+            'value': Decimal('120.00'),
+            'sender': 'Jane Doe',
+            'sender_bank': 'Bank A',
+            'sender_account': 'SK1111',
+            'currency': 'EUR',
+            'information': 'Order 100',
+            'variable_symbol': '100',
+            'type': 'Incoming payment',
+            'issued_by': None,
+        })
+        self.assertEqual(transactions[7]['value'], Decimal('-15.00'))
+        self.assertIsNone(transactions[7]['variable_symbol'])
+
+    def test_name(self):
+        self.assertEqual(FileStatementAdapter(STATEMENT_PATH).name, 'FILE')
+        self.assertEqual(FileStatementAdapter(STATEMENT_PATH, name='FIO').name, 'FIO')
+
+
+class ReconcileTest(SimpleTestCase):
+    def setUp(self):
+        self.orders = {number: OpenOrder(id=number, number=number, total=Decimal(total), paid=Decimal(paid)) for number, total, paid in [
+            (100, '120.00', '0'),
+            (101, '80.00', '0'),
+            (102, '150.00', '0'),
+            (103, '60.00', '0'),
+            (104, '99.90', '0'),
+            (105, '45.00', '0'),
+            (106, '50.00', '5.00'),
+        ]}
+        self.index = OpenOrderIndex(self.orders.values())
+        self.transactions = list(FileStatementAdapter(STATEMENT_PATH).get_transactions())
+        self.matches = {match.transaction['id']: match for match in reconcile(self.transactions, self.index)}
+
+    def assertMatch(self, transaction_id, result, order_number=None):
+        match = self.matches[transaction_id]
+        self.assertEqual(match.result, result, match.errors)
+        self.assertEqual(match.order_id, order_number)
+
+    def test_paid(self):
+        self.assertMatch('1001', BankTransaction.RESULT_PAID, 100)
+
+    def test_partial_payments(self):
+        self.assertMatch('1002', BankTransaction.RESULT_PARTIAL, 101)
+        self.assertMatch('1003', BankTransaction.RESULT_PAID, 101)
+
+    def test_overpaid(self):
+        self.assertMatch('1006', BankTransaction.RESULT_OVERPAID, 102)
+        self.assertEqual(self.matches['1006'].errors, 'Overpaid by 50.00')
+
+    def test_currency_mismatch(self):
+        self.assertMatch('1007', BankTransaction.RESULT_MISMATCH, 103)
+
+    def test_without_variable_symbol(self):
+        self.assertMatch('1004', BankTransaction.RESULT_SUGGESTED, 104)
+
+        # remaining amounts of orders 105 and 106 are the same
+        self.assertMatch('1005', BankTransaction.RESULT_AMBIGUOUS)
+        self.assertEqual(self.matches['1005'].errors, 'Missing variable symbol, amount matches orders 105, 106')
+
+    def test_not_matched(self):
+        self.assertMatch('1008', BankTransaction.RESULT_NOT_MATCHED)
+        self.assertMatch('1009', BankTransaction.RESULT_NOT_MATCHED)
+
+    def test_index(self):
+        # paid orders are removed, suggested and mismatched orders stay open
+        self.assertEqual(set(self.index.by_variable_symbol.keys()), {'103', '104', '105', '106'})
+        self.assertEqual(self.orders[101].paid, Decimal('50.00'))
+
+    def test_paid_order_ids(self):
+        self.assertEqual(get_paid_order_ids(self.matches.values()), {100, 101, 102})
+
+    def test_repeated_statement(self):
+        # the same payments again do not pay anything (orders are not open anymore)
+        matches = reconcile(self.transactions[:3], self.index)
+        self.assertEqual([match.result for match in matches], [BankTransaction.RESULT_NOT_MATCHED] * 3)
+
+    def test_normalize_variable_symbol(self):
+        self.assertEqual(normalize_variable_symbol('0000101'), '101')
+        self.assertEqual(normalize_variable_symbol(' 42 '), '42')
+        self.assertIsNone(normalize_variable_symbol('ABC'))
+        self.assertIsNone(normalize_variable_symbol(''))
+
+
+class OpenOrderIndexBuildTest(SimpleTestCase):
+    def test_order_without_stored_totals(self):
+        # order created before totals were stored
+        order = SimpleNamespace(id=1, number=107, items_subtotal=None, credit=None, tax=None, total=None, total_in_cents=None,
+                                loyalty_points=0, discount=None, vat_id='', shipping_fee=Decimal('3.00'), payment_fee=Decimal('1.00'))
+        import_module('commerce.migrations.0061_order_totals_backfill').calculate_totals(order, Decimal('40.00'))
+        self.assertEqual((order.total, order.total_in_cents), (Decimal('44.00'), 4400))
+
+        with mock.patch.object(Order, 'objects') as objects:
+            objects.awaiting_payment.return_value.annotate.return_value.values_list.return_value.iterator.return_value = [
+                (order.id, order.number, order.total, Decimal(0))
+            ]
+            index = OpenOrderIndex.build()
+
+        self.assertEqual(list(index.by_variable_symbol.keys()), ['107'])
+        self.assertEqual(list(index.by_amount.keys()), [Decimal('44.00')])
@@ -0,0 +1,101 @@
+from decimal import Decimal
+from smtplib import SMTPException
+from types import SimpleNamespace
+from unittest import mock
+
+from django.core import mail
+from django.test import SimpleTestCase, override_settings
+
+from commerce.jobs import send_order_reminders_chunk
+from commerce.mails import MailBatch
+from commerce.models import Order
+
+
+def get_mail_batch():
+    # without templates and sites framework
+    batch = MailBatch.__new__(MailBatch)
+    batch.template = batch.html_template = batch.site = None
+    batch.messages = []
+    return batch
+
+
+class FailingBackend(object):
+    # sends the first message only
+    def __init__(self, *args, **kwargs):
+        self.sent = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def send_messages(self, messages):
+        if self.sent:
+            raise SMTPException('Connection lost')
+
+        self.sent += len(messages)
+        return len(messages)
+
+
+@override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+class MailBatchTest(SimpleTestCase):
+    def test_send(self):
+        batch = get_mail_batch()
+        messages = [batch.add(f'user{i}@example.com', f'Subject {i}') for i in range(3)]
+        on_sent = mock.Mock()
+
+        self.assertEqual(batch.send(on_sent=on_sent), 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].to, ['user0@example.com'])
+        self.assertEqual(on_sent.call_args_list, [mock.call(message) for message in messages])
+
+    def test_send_empty(self):
+        self.assertEqual(get_mail_batch().send(), 0)
+
+    def test_connection_failure(self):
+        batch = get_mail_batch()
+        messages = [batch.add(f'user{i}@example.com', f'Subject {i}') for i in range(3)]
+        on_sent = mock.Mock()
+
+        with mock.patch('commerce.mails.get_connection', FailingBackend), self.assertRaises(SMTPException):
+            batch.send(on_sent=on_sent)
+
+        on_sent.assert_called_once_with(messages[0])
+
+
+@mock.patch.object(Order, 'objects')
+class SendOrderRemindersChunkTest(SimpleTestCase):
+    def setUp(self):
+        user = SimpleNamespace(preferred_language='en', email='customer@example.com')
+        self.orders = [
+            SimpleNamespace(id=1, number=101, total=Decimal('10.00'), user=user),
+            SimpleNamespace(id=2, number=102, total=Decimal('0.00'), user=user),
+            SimpleNamespace(id=3, number=103, total=Decimal('20.00'), user=user),
+        ]
+
+    def get_reminded_ids(self, objects):
+        # the first filter selects orders of the chunk, following ones mark reminded orders
+        return [call.kwargs['id__in'] for call in objects.filter.call_args_list if 'id__in' in call.kwargs][1:]
+
+    def send(self, objects, send_messages):
+        objects.filter.return_value.not_reminded.return_value.awaiting_payment.return_value\
+            .select_related.return_value.order_by.return_value = self.orders
+
+        with mock.patch('commerce.mails.MailBatch', side_effect=lambda template_prefix: get_mail_batch()), \
+                mock.patch('commerce.mails.get_connection') as get_connection:
+            get_connection.return_value.__enter__.return_value.send_messages.side_effect = send_messages
+            return send_order_reminders_chunk([order.id for order in self.orders])
+
+    def test_reminded(self, objects):
+        self.assertEqual(self.send(objects, lambda messages: 1), 2)
+
+        # free order is marked without reminder
+        self.assertEqual(self.get_reminded_ids(objects), [[2], [1, 3]])
+
+    def test_connection_failure(self, objects):
+        with self.assertRaises(SMTPException):
+            self.send(objects, [1, SMTPException('Connection lost')])
+
+        # orders reminded before failure are not reminded again
+        self.assertEqual(self.get_reminded_ids(objects), [[2], [1]])
@@ -0,0 +1,35 @@
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce.models import Order, PurchasedItem, Supply
+from commerce.stock import get_stock_contribution, update_stock_contribution
+
+
+class StockContributionTest(SimpleTestCase):
+    def get_purchased_item(self, status, quantity=2):
+        return PurchasedItem(order=Order(status=status), content_type_id=1, object_id=10, quantity=quantity)
+
+    def test_supply(self):
+        supply = Supply(content_type_id=1, object_id=10, quantity=5)
+        self.assertEqual(get_stock_contribution(supply), ((1, 10, None), 5, 0))
+
+    def test_purchased_item(self):
+        item = self.get_purchased_item(Order.STATUS_AWAITING_PAYMENT)
+        self.assertEqual(get_stock_contribution(item), ((1, 10, None), 0, 2))
+
+    def test_cancelled_order(self):
+        item = self.get_purchased_item(Order.STATUS_CANCELLED)
+        self.assertEqual(get_stock_contribution(item), ((1, 10, None), 0, 0))
+
+    @mock.patch('commerce.stock.apply_stock_delta')
+    def test_update(self, apply_stock_delta):
+        item = self.get_purchased_item(Order.STATUS_PAYMENT_RECEIVED, quantity=3)
+        item._stored_stock_contribution = ((1, 10, None), 0, 2)
+        update_stock_contribution(item)
+
+        self.assertEqual(apply_stock_delta.call_args_list, [
+            mock.call(1, 10, None, supplies=0, purchased=-2),
+            mock.call(1, 10, None, supplies=0, purchased=3),
+        ])
+        self.assertIsNone(item._stored_stock_contribution)
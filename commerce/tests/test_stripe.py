@@ -0,0 +1,42 @@
+from types import SimpleNamespace
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from commerce.gateways.stripe.events import handle_checkout_session_completed, process_event
+from commerce.gateways.stripe.models import StripeEvent
+from commerce.models import Order
+
+
+def get_checkout_session_event(payment_status='paid'):
+    session = SimpleNamespace(payment_status=payment_status, client_reference_id='101')
+    return SimpleNamespace(data=SimpleNamespace(object=session))
+
+
+@mock.patch.object(Order, 'save')
+@mock.patch.object(Order, 'objects')
+class CheckoutSessionCompletedTest(SimpleTestCase):
+    def test_paid(self, objects, save):
+        order = Order(number=101, status=Order.STATUS_AWAITING_PAYMENT)
+        objects.get.return_value = order
+        handle_checkout_session_completed(get_checkout_session_event())
+
+        objects.get.assert_called_once_with(number=101)
+        self.assertEqual(order.status, Order.STATUS_PAYMENT_RECEIVED)
+        save.assert_called_once_with(update_fields=['status'])
+
+    def test_repeated_event(self, objects, save):
+        objects.get.return_value = Order(number=101, status=Order.STATUS_SHIPPED)
+        handle_checkout_session_completed(get_checkout_session_event())
+
+        self.assertEqual(objects.get.return_value.status, Order.STATUS_SHIPPED)
+        save.assert_not_called()
+
+    def test_unpaid(self, objects, save):
+        handle_checkout_session_completed(get_checkout_session_event(payment_status='unpaid'))
+        objects.get.assert_not_called()
+
+
+class ProcessEventTest(SimpleTestCase):
+    def test_ignored(self):
+        self.assertEqual(process_event(StripeEvent(type='charge.succeeded', payload={})), StripeEvent.STATUS_IGNORED)
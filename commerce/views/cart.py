@@ -8,7 +8,8 @@ from django.views.generic import DetailView, UpdateView
 
 from commerce import settings as commerce_settings
 from commerce.forms import AddressesForm, ShippingAndPaymentForm, DiscountCodeForm
-from commerce.models import Cart, Order, PaymentMethod, Item, Option, ShippingOption
+from commerce.models import Cart, Order, PaymentMethod, Item, Option
+from commerce.shipping import get_shipping_matrix
 from commerce.templatetags.commerce import discount_for_product
 
 from django.utils.translation import gettext_lazy as _
@@ -19,7 +20,7 @@ class AddToCartView(LoginRequiredMixin, View):
         content_type = get_object_or_404(ContentType, id=kwargs['content_type_id'])
         product = get_object_or_404(content_type.model_class(), id=kwargs['object_id'])
         option = get_object_or_404(Option, slug_i18n=request.GET['option']) if 'option' in request.GET else None
-        cart = Cart.get_for_user(request.user)
+        cart = Cart.get_for_request(request)
 
         # TODO: settings:
         # TODO: check if product can be added multiple times into cart
@@ -67,9 +68,12 @@ class AddToCartView(LoginRequiredMixin, View):
 
 class UnapplyDiscountCartView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
-        cart = Cart.get_for_user(request.user)
-        cart.discount = None
-        cart.save(update_fields=['discount'])
+        cart = Cart.get_for_request(request)
+
+        if cart.discount:
+            cart.discount = None
+            cart.save(update_fields=['discount'])
+
         back_url = request.GET.get('back_url', cart.get_absolute_url())
         return redirect(back_url)
 
@@ -77,13 +81,9 @@ class UnapplyDiscountCartView(LoginRequiredMixin, View):
 class RemoveFromCartView(LoginRequiredMixin, View):
     def get(self, request, *args, **kwargs):
         item = get_object_or_404(Item, id=kwargs['item_id'])
-        cart = Cart.get_for_user(request.user)
+        cart = Cart.get_for_request(request)
 
-        if item in cart.item_set.all():
-            item.quantity -= 1
-            item.save(update_fields=['quantity'])
-            if item.quantity <= 0:
-                item.delete()
+        if cart.pk is not None and item.cart_id == cart.pk and cart.remove_item(item):
             messages.info(request, _('%s removed from cart') % item)
 
         # discount
@@ -98,7 +98,7 @@ class RemoveFromCartView(LoginRequiredMixin, View):
             cart.update_loyalty_points()
 
         # delete empty cart
-        if not cart.item_set.exists():
+        if cart.pk is not None and cart.is_empty():
             cart.delete()
 
         back_url = request.GET.get('back_url', cart.get_absolute_url())
@@ -109,7 +109,7 @@ class CartMixin(LoginRequiredMixin):
     model = Cart
 
     def get_object(self, queryset=None):
-        return self.model.get_for_user(self.request.user)
+        return self.model.get_for_request(self.request)
 
 
 class CartDetailView(CartMixin, UpdateView):
@@ -207,11 +207,11 @@ class CheckoutShippingAndPaymentView(CartMixin, EmptyCartRedirectMixin, UpdateVi
 
     def get(self, request, *args, **kwargs):
         self.object = self.get_object()
-        shipping_options = ShippingOption.objects.for_country(self.object.delivery_country)
-        payment_methods = PaymentMethod.objects.all()
+        shipping_options = self.object.shipping_options
+        payment_methods = get_shipping_matrix().payment_methods
 
-        if shipping_options.count() == 1 and payment_methods.count() == 1:
-            if shipping_options.first().fee == 0 and payment_methods.first().fee == 0:
+        if len(shipping_options) == 1 and len(payment_methods) == 1:
+            if shipping_options[0].fee == 0 and payment_methods[0].fee == 0:
                 form_kwargs = self.get_form_kwargs()
                 form_kwargs.update({'data': self.get_initial()})
                 form = self.get_form_class()(**form_kwargs)
@@ -230,18 +230,18 @@ class CheckoutShippingAndPaymentView(CartMixin, EmptyCartRedirectMixin, UpdateVi
     def get_initial(self):
         initial = super().get_initial()
 
-        shipping_options = ShippingOption.objects.for_country(self.object.delivery_country)
+        shipping_options = self.object.shipping_options
 
-        if shipping_options.count() == 1:
+        if len(shipping_options) == 1:
             initial.update({
-                'shipping_option': shipping_options.first()
+                'shipping_option': shipping_options[0]
             })
 
-        payment_methods = PaymentMethod.objects.all()
+        payment_methods = get_shipping_matrix().payment_methods
 
-        if payment_methods.count() == 1:
+        if len(payment_methods) == 1:
             initial.update({
-                'payment_method': payment_methods.first()
+                'payment_method': payment_methods[0]
             })
 
         return initial
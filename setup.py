@@ -15,7 +15,7 @@ setup(
     url='https://github.com/PragmaticMates/django-commerce',
     packages=find_packages(),
     include_package_data=True,
-    install_requires=('django', 'django-invoicing'),
+    install_requires=('django', 'django-invoicing', 'requests'),
     classifiers=[
         'Programming Language :: Python',
         'Programming Language :: Python :: 3.7',